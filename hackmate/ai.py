@@ -0,0 +1,71 @@
+import importlib
+from typing import Any, Callable, Dict
+
+# A model backend takes the full prompt and the "ai" config section and returns
+# the model's reply as text. The "backend" config key picks a built-in backend
+# by name or any importable callable as "package.module:function".
+ModelBackend = Callable[[str, Dict[str, Any]], str]
+
+SYSTEM_PROMPT = (
+    "You are assisting an authorized penetration tester using the HackMateX CLI. "
+    "Given a digest of the current workspace, suggest the three to five most useful "
+    "next steps, each with the HackMateX command to run and a one-line reason."
+)
+
+def build_prompt(digest_text: str) -> str:
+    return f"{SYSTEM_PROMPT}\n\n{digest_text}\n\nSuggested next steps:"
+
+def _openai_backend(prompt: str, ai_config: Dict[str, Any]) -> str:
+    """Calls an OpenAI-compatible chat completions endpoint."""
+    import requests # Imported here so CLI startup does not pay for it
+    if not ai_config.get("api_key"):
+        raise RuntimeError("No API key configured. Set ai.api_key or OPENAI_API_KEY.")
+    response = requests.post(
+        ai_config["base_url"].rstrip("/") + "/chat/completions",
+        headers={"Authorization": f"Bearer {ai_config['api_key']}"},
+        json={"model": ai_config["model"], "messages": [{"role": "user", "content": prompt}]},
+        timeout=ai_config["timeout"],
+    )
+    response.raise_for_status()
+    return response.json()["choices"][0]["message"]["content"].strip()
+
+def _stub_backend(prompt: str, ai_config: Dict[str, Any]) -> str:
+    """
+    Offline stand-in that answers from simple rules over the digest text. It needs
+    no network or API key, so tests and demos get deterministic suggestions.
+    """
+    target = "<target>"
+    if "Workspace digest for " in prompt:
+        target = prompt.split("Workspace digest for ", 1)[1].split("\n", 1)[0].strip()
+    suggestions = []
+    if "Not collected yet:" in prompt:
+        missing = prompt.split("Not collected yet:", 1)[1].split("\n", 1)[0]
+        if "subdomains_raw.txt" in missing:
+            suggestions.append(f"hackmate recon subdomains {target}  # no subdomains collected yet")
+        if "live_hosts_raw.txt" in missing:
+            suggestions.append(f"hackmate recon probe {target}  # find live web hosts")
+        if "nmap_scan.xml" in missing:
+            suggestions.append(f"hackmate scan nmap {target} --resolved --confirm-scope --execute  # map open services")
+        if "nuclei_results.jsonl" in missing:
+            suggestions.append(f"hackmate web nuclei {target} --confirm-scope --execute  # scan live hosts for known issues")
+    if "Notable findings:" in prompt:
+        suggestions.append(f"hackmate notes list {target}  # verify and write up the notable findings")
+    if "New since last run:" in prompt:
+        suggestions.append(f"hackmate report generate {target}  # the workspace changed since the last digest")
+    if not suggestions:
+        suggestions.append(f"hackmate report generate {target}  # all stages have run; review and report")
+    return "\n".join(f"{i}. {suggestion}" for i, suggestion in enumerate(suggestions, 1))
+
+BACKENDS: Dict[str, ModelBackend] = {
+    "openai": _openai_backend,
+    "stub": _stub_backend,
+}
+
+def load_backend(name: str) -> ModelBackend:
+    """Returns a built-in backend or imports one given as 'module:function'."""
+    if name in BACKENDS:
+        return BACKENDS[name]
+    module_name, _, attr = name.partition(":")
+    if not attr:
+        raise ValueError(f"Unknown AI backend '{name}'. Use one of {', '.join(BACKENDS)} or 'module:function'.")
+    return getattr(importlib.import_module(module_name), attr)
@@ -0,0 +1,110 @@
+import gzip
+import os
+import shutil
+from pathlib import Path
+from typing import IO, List, Optional
+
+try:
+    import zstandard
+except ImportError: # Optional dependency; gzip is used when it is missing
+    zstandard = None
+
+# Cold raw artifacts are stored as '<name>.zst' or '<name>.gz'. Readers ask for the
+# original name and get whichever variant exists, decompressed on the fly.
+COMPRESSED_SUFFIXES = (".zst", ".gz")
+
+def resolve_codec(codec: str = "auto") -> str:
+    """Returns 'zstd' or 'gzip', falling back to gzip when zstandard is not installed."""
+    if codec in ("auto", "zstd") and zstandard is not None:
+        return "zstd"
+    return "gzip"
+
+def compressed_variants(path: Path) -> List[Path]:
+    return [path.with_name(path.name + suffix) for suffix in COMPRESSED_SUFFIXES]
+
+def original_name(name: str) -> str:
+    """Strips a compression suffix from an artifact file name."""
+    for suffix in COMPRESSED_SUFFIXES:
+        if name.endswith(suffix):
+            return name[:-len(suffix)]
+    return name
+
+def find_artifact(path: Path) -> Optional[Path]:
+    """Returns the plain artifact if it exists, else its compressed variant, else None."""
+    if path.exists():
+        return path
+    for candidate in compressed_variants(path):
+        if candidate.exists():
+            return candidate
+    return None
+
+def open_artifact(path: Path, mode: str = "rt") -> IO:
+    """
+    Opens an artifact for streaming reads, transparently decompressing it if only
+    a compressed variant exists. Use 'rt' for text and 'rb' for bytes.
+    """
+    found = find_artifact(path)
+    if found is None:
+        raise FileNotFoundError(f"Artifact not found: {path}")
+    binary = "b" in mode
+    encoding = None if binary else "utf-8"
+    mode = "rb" if binary else "rt"
+
+    if found == path:
+        return open(found, mode, encoding=encoding)
+    if found.name.endswith(".gz"):
+        return gzip.open(found, mode, encoding=encoding)
+    if zstandard is None:
+        raise RuntimeError(f"{found.name} is zstd-compressed; install the 'zstandard' package to read it.")
+    return zstandard.open(found, mode, encoding=encoding)
+
+def discard_compressed(path: Path):
+    """Removes stale compressed variants after an artifact has been rewritten."""
+    for candidate in compressed_variants(path):
+        if candidate.exists():
+            candidate.unlink()
+
+def ensure_plain(path: Path) -> Path:
+    """
+    Decompresses an artifact back to its plain name, for external tools that read
+    files themselves (e.g. httpx -l). Returns the path whether or not it exists.
+    """
+    if path.exists() or find_artifact(path) is None:
+        return path
+    tmp_path = path.with_name(path.name + ".tmp")
+    with open_artifact(path, "rb") as src, open(tmp_path, "wb") as dst:
+        shutil.copyfileobj(src, dst)
+    os.replace(tmp_path, path)
+    discard_compressed(path)
+    return path
+
+def compress_file(path: Path, codec: str = "auto") -> Optional[Path]:
+    """
+    Compresses an artifact next to itself and removes the original. The original
+    mtime is kept so retention policies still see the artifact's real age.
+
+    :return: The compressed path, or None if the file changed while compressing.
+    """
+    codec = resolve_codec(codec)
+    target = path.with_name(path.name + (".zst" if codec == "zstd" else ".gz"))
+    tmp_path = target.with_name(target.name + ".tmp")
+    before = path.stat()
+
+    with open(path, "rb") as src:
+        if codec == "zstd":
+            with zstandard.open(tmp_path, "wb") as dst:
+                shutil.copyfileobj(src, dst)
+        else:
+            with gzip.open(tmp_path, "wb", compresslevel=6) as dst:
+                shutil.copyfileobj(src, dst)
+
+    if path.stat().st_mtime_ns != before.st_mtime_ns:
+        tmp_path.unlink()
+        return None
+    os.replace(tmp_path, target)
+    os.utime(target, ns=(before.st_atime_ns, before.st_mtime_ns))
+    for candidate in compressed_variants(path):
+        if candidate != target and candidate.exists():
+            candidate.unlink()
+    path.unlink()
+    return target
@@ -1,5 +1,7 @@
 import click
-from rich.console import Console
+import sys
+import time
+from rich.table import Table
 from .recon import recon
 from .scan import scan
 from .web import web
@@ -7,17 +9,22 @@ from .exploit import exploit
 from .osint import osint
 from .notes_report import notes, report
 from .flow_plugin import flow
-from .config import CONFIG, HACKMATE_CONFIG_FILE
+from .scope import scope
+from .workspace import workspace, schedule_background_compaction
+from .plugins import PluginGroup, load_plugins
+from .config import CONFIG, HACKMATE_CONFIG_FILE, HACKMATE_PLUGIN_DIR
+from .utils import console
+from .events import emit, error_count, set_output_mode, OUTPUT_MODES
 
-console = Console()
-
-@click.group()
+@click.group(cls=PluginGroup)
 @click.version_option("0.1.0", prog_name="HackMate")
-def cli():
+@click.option("--output", "output_mode", type=click.Choice(OUTPUT_MODES), default="rich", envvar="HACKMATE_OUTPUT", show_default=True, help="Output format: rich terminal output, or JSONL events on stdout for automation.")
+def cli(output_mode):
     """
     HackMate: A modular, extensible command-line assistant for Kali Linux.
     """
-    pass
+    set_output_mode(output_mode)
+    emit("run_start", argv=sys.argv[1:])
 
 # Add command groups
 cli.add_command(recon)
@@ -28,10 +35,13 @@ cli.add_command(osint)
 cli.add_command(notes)
 cli.add_command(report)
 cli.add_command(flow)
+cli.add_command(scope)
+cli.add_command(workspace)
 
 @cli.command()
 def config():
     """Shows the current configuration file path."""
+    emit("result", kind="config", data={"config_file": str(HACKMATE_CONFIG_FILE), "workspace_dir": CONFIG["workspace_dir"]})
     console.print(f"[bold cyan]HackMate Configuration File:[/bold cyan] {HACKMATE_CONFIG_FILE}")
     console.print(f"[bold cyan]Workspace Root:[/bold cyan] {CONFIG['workspace_dir']}")
     console.print("\n[dim]Edit this file to change tool paths, safe defaults, and AI settings.[/dim]")
@@ -41,11 +51,46 @@ def tools():
     """Lists the external tools configured for HackMate."""
     console.print("[bold cyan]Configured External Tools:[/bold cyan]")
     for tool, path in CONFIG["tools"].items():
+        emit("result", kind="tool", data={"tool": tool, "path": path})
         console.print(f"  [bold]{tool}:[/bold] {path}")
     console.print("\n[dim]Ensure these tools are installed and accessible in your PATH, or update the paths in the config file.[/dim]")
 
+@cli.command()
+@click.option("--refresh", is_flag=True, help="Rebuild the plugin registry cache before listing.")
+def plugins(refresh):
+    """Lists installed plugins and their commands and flow steps."""
+    registry = load_plugins(refresh=refresh)
+    if not registry["command"] and not registry["step"]:
+        console.print(f"[bold yellow]No plugins found.[/bold yellow] Drop plugins into {HACKMATE_PLUGIN_DIR} or install a package exposing 'hackmate.commands' entry points.")
+        return
+
+    table = Table(title="HackMate Plugins")
+    table.add_column("Name", style="cyan", no_wrap=True)
+    table.add_column("Kind", style="magenta")
+    table.add_column("Plugin", style="green")
+    table.add_column("Source", style="dim")
+
+    for kind in ("command", "step"):
+        for name, declaration in sorted(registry[kind].items()):
+            emit("result", kind="plugin", data=dict(declaration, name=name, kind=kind))
+            table.add_row(name, "flow step" if kind == "step" else kind, declaration["plugin"], declaration["source"])
+
+    console.print(table)
+
 def main():
-    cli()
+    started = time.monotonic()
+    status = "error"
+    try:
+        cli()
+    except SystemExit as e:
+        # Commands report most failures through error() and return normally
+        if not e.code and error_count():
+            e.code = 1
+        status = "ok" if not e.code else "error"
+        raise
+    finally:
+        emit("run_end", status=status, duration_ms=round((time.monotonic() - started) * 1000))
+        schedule_background_compaction()
 
 if __name__ == '__main__':
     main()
@@ -1,4 +1,5 @@
 import os
+import sys
 from pathlib import Path
 from tinydb import TinyDB
 import yaml
@@ -7,6 +8,13 @@ import yaml
 HACKMATE_HOME = Path.home() / ".hackmate"
 HACKMATE_CONFIG_FILE = HACKMATE_HOME / "config.yaml"
 HACKMATE_DB_FILE = HACKMATE_HOME / "notes.json"
+HACKMATE_NOTES_INDEX = HACKMATE_HOME / "notes_index.db"
+HACKMATE_PLUGIN_DIR = HACKMATE_HOME / "plugins"
+HACKMATE_PLUGIN_REGISTRY = HACKMATE_HOME / "plugin_registry.json"
+HACKMATE_DNS_CACHE = HACKMATE_HOME / "dns_cache.json"
+HACKMATE_COMPACTION_STAMP = HACKMATE_HOME / ".last_compaction"
+# Engagement-wide scope used when no workspace on the target's domain path has a scope file
+HACKMATE_GLOBAL_SCOPE = HACKMATE_HOME / "scope.txt"
 
 # Default configuration
 DEFAULT_CONFIG = {
@@ -25,10 +33,37 @@ DEFAULT_CONFIG = {
         "ffuf": "ffuf",
         "nuclei": "nuclei",
     },
+    "dns": {
+        "resolvers": ["1.1.1.1", "8.8.8.8", "9.9.9.9"],
+        "concurrency": 200,
+        "timeout": 2,
+        "retries": 2,
+        "record_types": ["A", "AAAA"],
+    },
+    "nuclei": {
+        "severities": ["critical", "high", "medium"],
+        "workers": 4,
+        "rate_limit": 150, # Requests per second across all workers
+        "hosts_per_batch": 500,
+        "timeout": 3600,
+    },
+    "retention": {
+        "auto_compress": True,
+        "codec": "auto", # zstd if the optional 'zstandard' package is installed, else gzip
+        "compress_after_hours": 24,
+        "compress_min_kb": 64,
+        "raw_patterns": ["*_raw.txt", "*_out_of_scope.txt", "nmap_scan*", "*.jsonl", "*_hosts.json", "host_ip_map.json"],
+        "max_age_days": 0, # 0 keeps raw artifacts forever
+        "max_size_mb": 0, # 0 disables the size cap
+    },
     "ai": {
         "enabled": False,
+        "backend": "openai", # "openai", "stub" (offline) or "module:function"
         "model": "gpt-4.1-mini",
         "api_key": os.environ.get("OPENAI_API_KEY", ""),
+        "base_url": "https://api.openai.com/v1",
+        "timeout": 60,
+        "digest_tokens": 1500, # Budget for the workspace digest sent with each prompt
     }
 }
 
@@ -36,11 +71,12 @@ def init_hackmate_home():
     """Initializes the .hackmate directory and default config file."""
     HACKMATE_HOME.mkdir(parents=True, exist_ok=True)
     Path(DEFAULT_CONFIG["workspace_dir"]).mkdir(parents=True, exist_ok=True)
+    HACKMATE_PLUGIN_DIR.mkdir(parents=True, exist_ok=True)
     
     if not HACKMATE_CONFIG_FILE.exists():
         with open(HACKMATE_CONFIG_FILE, "w") as f:
             yaml.dump(DEFAULT_CONFIG, f, default_flow_style=False)
-        print(f"Created default config at {HACKMATE_CONFIG_FILE}")
+        print(f"Created default config at {HACKMATE_CONFIG_FILE}", file=sys.stderr) # keep stdout clean for --output jsonl
 
 def load_config():
     """Loads the configuration from the YAML file."""
@@ -53,7 +89,7 @@ def load_config():
         # Simple merge for top-level keys
         merged_config.update(config)
         # Deep merge for nested keys like 'safe_defaults' and 'tools'
-        for key in ["safe_defaults", "tools", "ai"]:
+        for key in ["safe_defaults", "tools", "dns", "nuclei", "retention", "ai"]:
             if key in config and isinstance(config[key], dict):
                 merged_config[key].update(config[key])
         return merged_config
@@ -61,13 +97,15 @@ def load_config():
         # print(f"Warning: Could not load config file. Using defaults. Error: {e}")
         return DEFAULT_CONFIG
 
+def sanitize_target(target: str) -> str:
+    """Returns the workspace directory name for a target."""
+    return target.lower().replace("http://", "").replace("https://", "").replace("/", "_").replace(":", "_")
+
 def get_workspace_path(target: str) -> Path:
     """Returns the path to the workspace directory for a given target."""
     config = load_config()
     workspace_root = Path(config["workspace_dir"])
-    # Sanitize target name for directory creation
-    sanitized_target = target.lower().replace("http://", "").replace("https://", "").replace("/", "_").replace(":", "_")
-    target_path = workspace_root / sanitized_target
+    target_path = workspace_root / sanitize_target(target)
     target_path.mkdir(parents=True, exist_ok=True)
     return target_path
 
@@ -0,0 +1,405 @@
+import base64
+import hashlib
+import json
+import os
+import re
+import zlib
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .artifacts import find_artifact, open_artifact
+from .scan import parse_nmap_xml
+
+# The AI digest condenses a workspace into a short text summary that fits a model
+# prompt no matter how many hosts the workspace holds. Each source artifact is
+# summarized on its own and cached in DIGEST_FILE with the artifact's mtime:
+#
+# - unchanged artifacts (including ones compressed since, which keep their mtime)
+#   are not read at all;
+# - line-based artifacts that only grew are read from the previous end offset;
+# - anything else is re-read in full.
+#
+# A summary is an item count, counters over the items and a list of notable
+# entries. The item keys themselves (hosts, URLs, open ports, finding keys) are not
+# stored: each source keeps a Bloom filter of them, at most FILTER_MAX_BITS large,
+# which skips keys already counted when lines are appended and tells which keys
+# are "new since last run". Filters only err towards taking a new key as seen, and
+# rarely while a source holds fewer items than its filter's capacity.
+
+DIGEST_FILE = ".ai_digest.json"
+DIGEST_VERSION = 2
+
+# Rough size of a token, used to keep the rendered digest within its budget
+CHARS_PER_TOKEN = 4
+# Bytes hashed at the start of a line artifact to detect rewrites vs appends
+HEAD_BYTES = 4096
+MAX_NOTABLE = 200
+MAX_NEW_SAMPLE = 200
+MAX_COUNTER_VALUES = 500
+
+FILTER_BITS_PER_ITEM = 10
+FILTER_HASHES = 7
+FILTER_MIN_BITS = 1 << 13
+FILTER_MAX_BITS = 1 << 21 # 256 KiB per source before compression, enough for ~200k items
+
+SEVERITY_ORDER = ["critical", "high", "medium", "low", "info", "unknown"]
+
+_ANSI = re.compile(r"\x1b\[[0-9;]*m")
+_BRACKETS = re.compile(r"\[([^\]]*)\]")
+
+# A line parser returns (item key, {counter: [values]}, notable entry or None) for
+# lines that describe an item, and None for lines to ignore.
+LineParser = Callable[[str], Optional[Tuple[str, Dict[str, List[str]], Optional[Dict[str, Any]]]]]
+
+# --- Artifact Parsers ---
+
+def _parse_subdomain_line(line: str):
+    host = line.strip().lower().rstrip(".")
+    if not host or host.startswith("#"):
+        return None
+    return host, {}, None
+
+def _parse_httpx_line(line: str):
+    """Parses 'https://host [200] [Title] [Tech1,Tech2]' as written by httpx -o."""
+    line = _ANSI.sub("", line).strip()
+    if not line or line.startswith("#"):
+        return None
+    url = line.split(None, 1)[0]
+    groups = _BRACKETS.findall(line)
+    counters = {}
+    if groups and groups[0].isdigit():
+        counters["status_codes"] = [groups[0]]
+        groups = groups[1:]
+    # httpx prints the title before the technologies; a lone group is the title
+    if len(groups) >= 2:
+        counters["technologies"] = [tech.strip() for tech in groups[-1].split(",") if tech.strip()]
+    return url, counters, None
+
+def _parse_nuclei_line(line: str):
+    try:
+        result = json.loads(line)
+    except ValueError:
+        return None
+    info = result.get("info", {})
+    severity = str(info.get("severity", "unknown")).lower()
+    matched_at = result.get("matched-at") or result.get("host", "")
+    template_id = result.get("template-id", "")
+    notable = None
+    if severity not in ("info", "unknown"):
+        notable = {"severity": severity, "text": f"{info.get('name', template_id)} [{template_id}] at {matched_at}"}
+    return f"{template_id}:{matched_at}", {"severities": [severity], "templates": [template_id]}, notable
+
+LINE_SOURCES: Dict[str, LineParser] = {
+    "subdomains_raw.txt": _parse_subdomain_line,
+    "live_hosts_raw.txt": _parse_httpx_line,
+    "nuclei_results.jsonl": _parse_nuclei_line,
+}
+
+def _summarize_nmap(path: Path, summary: Dict[str, Any]):
+    for ip, ports in parse_nmap_xml(path).items():
+        for port in ports:
+            if port.get("state") != "open":
+                continue
+            key = f"{ip}:{port['port']}/{port['protocol']}"
+            service = port.get("service") or "unknown"
+            counters = {"services": [f"{service} ({port['port']}/{port['protocol']})"]}
+            if port.get("product"):
+                counters["products"] = [port["product"]]
+            _add_item(summary, key, counters, None)
+
+# Artifacts that are rewritten as a whole and always summarized from scratch
+FILE_SOURCES: Dict[str, Callable[[Path, Dict[str, Any]], None]] = {
+    "nmap_scan.xml": _summarize_nmap,
+}
+
+# --- Summaries ---
+
+class _SeenFilter:
+    """A Bloom filter over item keys, used like a set with 'in' and add()."""
+
+    def __init__(self, bits: int, data: Optional[bytearray] = None):
+        self.bits = bits
+        self.data = data if data is not None else bytearray(bits // 8)
+
+    @classmethod
+    def for_items(cls, count: int) -> "_SeenFilter":
+        bits = FILTER_MIN_BITS
+        while bits < count * FILTER_BITS_PER_ITEM and bits < FILTER_MAX_BITS:
+            bits <<= 1
+        return cls(bits)
+
+    @classmethod
+    def load(cls, data: Dict[str, Any]) -> "_SeenFilter":
+        return cls(data["bits"], bytearray(zlib.decompress(base64.b64decode(data["data"]))))
+
+    def dump(self) -> Dict[str, Any]:
+        return {"bits": self.bits, "data": base64.b64encode(zlib.compress(bytes(self.data))).decode("ascii")}
+
+    def capacity(self) -> int:
+        return self.bits // FILTER_BITS_PER_ITEM
+
+    def _positions(self, key: str) -> List[int]:
+        digest = hashlib.blake2b(key.encode("utf-8", "replace"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return [(h1 + i * h2) % self.bits for i in range(FILTER_HASHES)]
+
+    def __contains__(self, key: str) -> bool:
+        return all(self.data[p >> 3] & (1 << (p & 7)) for p in self._positions(key))
+
+    def add(self, key: str):
+        for p in self._positions(key):
+            self.data[p >> 3] |= 1 << (p & 7)
+
+def _empty_summary(baseline: Optional[_SeenFilter] = None) -> Dict[str, Any]:
+    """
+    A summary that collects its keys exactly, in a set. Keys missing from
+    'baseline' (the previous digest's filter) are recorded as new.
+    """
+    return {"count": 0, "seen": set(), "baseline": baseline, "counters": {}, "notable": [], "new": [], "new_count": 0}
+
+def _trim_notable(notable: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    rank = {severity: i for i, severity in enumerate(SEVERITY_ORDER)}
+    return sorted(notable, key=lambda item: rank.get(item["severity"], len(rank)))[:MAX_NOTABLE]
+
+def _add_item(summary: Dict[str, Any], key: str, counters: Dict[str, List[str]], notable: Optional[Dict[str, Any]]):
+    """Adds an item once; repeated keys do not inflate the counters."""
+    seen = summary["seen"]
+    if key in seen:
+        return
+    baseline = summary["baseline"]
+    if baseline is not None and key not in baseline:
+        summary["new_count"] += 1
+        if len(summary["new"]) < MAX_NEW_SAMPLE:
+            summary["new"].append(key)
+    seen.add(key)
+    summary["count"] += 1
+    for name, values in counters.items():
+        counter = summary["counters"].setdefault(name, Counter())
+        counter.update(values)
+    if notable is not None:
+        summary["notable"].append(notable)
+        if len(summary["notable"]) > 2 * MAX_NOTABLE:
+            summary["notable"] = _trim_notable(summary["notable"])
+
+def _head_hash(path: Path, length: int) -> str:
+    with open(path, "rb") as f:
+        return hashlib.sha1(f.read(min(length, HEAD_BYTES))).hexdigest()
+
+def _summarize_lines(path: Path, parse: LineParser, summary: Dict[str, Any], offset: int = 0) -> Tuple[int, bool]:
+    """
+    Feeds the lines of an artifact into a summary. A full read (offset 0) includes
+    an unterminated last line; an append read from 'offset' leaves it for the next
+    update, as the writer may still be in the middle of it.
+
+    :return: (end offset of the last complete line, whether a partial line followed it).
+    """
+    if offset:
+        f = open(path, "rb")
+        f.seek(offset)
+    else:
+        f = open_artifact(path, "rb")
+    with f:
+        end = offset
+        for raw in f:
+            if not raw.endswith(b"\n"):
+                if offset:
+                    return end, True
+                parsed = parse(raw.decode("utf-8", "replace"))
+                if parsed is not None:
+                    _add_item(summary, *parsed)
+                return end, True
+            end += len(raw)
+            parsed = parse(raw.decode("utf-8", "replace"))
+            if parsed is not None:
+                _add_item(summary, *parsed)
+    return end, False
+
+def _load_summary(data: Dict[str, Any]) -> Dict[str, Any]:
+    """Reopens a stored summary for appending; every key it has not seen yet is new."""
+    seen = _SeenFilter.load(data["seen"])
+    return {
+        "count": data["count"],
+        "seen": seen,
+        "baseline": seen,
+        "counters": {name: Counter(values) for name, values in data.get("counters", {}).items()},
+        "notable": data.get("notable", []),
+        "new": [],
+        "new_count": 0,
+    }
+
+def _dump_summary(summary: Dict[str, Any]) -> Dict[str, Any]:
+    seen = summary["seen"]
+    if isinstance(seen, set):
+        keys, seen = seen, _SeenFilter.for_items(len(seen))
+        for key in keys:
+            seen.add(key)
+    return {
+        "count": summary["count"],
+        "seen": seen.dump(),
+        "counters": {name: dict(counter.most_common(MAX_COUNTER_VALUES)) for name, counter in summary["counters"].items()},
+        "notable": _trim_notable(summary["notable"]),
+    }
+
+def _previous_filter(previous: Optional[Dict[str, Any]]) -> Optional[_SeenFilter]:
+    # Only report items as new when there was an earlier digest to compare with
+    return _SeenFilter.load(previous["summary"]["seen"]) if previous else None
+
+# --- Digest ---
+
+def load_digest(workspace: Path) -> Dict[str, Any]:
+    path = workspace / DIGEST_FILE
+    try:
+        with open(path, "r") as f:
+            digest = json.load(f)
+    except (OSError, ValueError):
+        return {"version": DIGEST_VERSION, "sources": {}}
+    if digest.get("version") != DIGEST_VERSION:
+        return {"version": DIGEST_VERSION, "sources": {}}
+    return digest
+
+def save_digest(workspace: Path, digest: Dict[str, Any]):
+    path = workspace / DIGEST_FILE
+    tmp_path = path.with_name(path.name + ".tmp")
+    with open(tmp_path, "w") as f:
+        json.dump(digest, f)
+    os.replace(tmp_path, path)
+
+def update_digest(workspace: Path, persist: bool = True) -> Tuple[Dict[str, Any], Dict[str, str]]:
+    """
+    Brings the workspace digest up to date, reading only artifacts that changed
+    since the last update. With persist=False the result is not saved, so a
+    preview does not consume what is "new since last run"; a digest in which
+    nothing changed is not saved either.
+
+    :return: (digest, {artifact: 'cached' | 'appended' | 'rebuilt' | 'removed'}).
+    """
+    digest = load_digest(workspace)
+    sources = digest["sources"]
+    actions = {}
+
+    for name in list(LINE_SOURCES) + list(FILE_SOURCES):
+        found = find_artifact(workspace / name)
+        previous = sources.get(name)
+        if found is None:
+            if previous is not None:
+                del sources[name]
+                actions[name] = "removed"
+            continue
+
+        stat = found.stat()
+        if previous is not None and previous["mtime_ns"] == stat.st_mtime_ns:
+            previous["new"], previous["new_count"] = [], 0
+            actions[name] = "cached"
+            continue
+
+        plain = found.name == name
+        if name in LINE_SOURCES:
+            offset = previous.get("offset", 0) if previous else 0
+            appended = (
+                plain and previous is not None and 0 < offset <= stat.st_size
+                and previous.get("head") == _head_hash(found, offset)
+            )
+            if appended:
+                summary = _load_summary(previous["summary"])
+                end, _ = _summarize_lines(found, LINE_SOURCES[name], summary, offset)
+                actions[name] = "appended"
+                # A filter cannot grow in place, so one past its capacity is rebuilt larger
+                seen = summary["seen"]
+                appended = summary["count"] <= seen.capacity() or seen.bits >= FILTER_MAX_BITS
+            if not appended:
+                summary = _empty_summary(_previous_filter(previous))
+                end, partial = _summarize_lines(workspace / name, LINE_SOURCES[name], summary)
+                # A partial last line was counted, so appending to it must trigger a full re-read
+                if partial:
+                    end = 0
+                actions[name] = "rebuilt"
+            # Offsets only apply to the plain file; compressed artifacts are re-read in full
+            entry = {"offset": end if plain else 0, "head": _head_hash(found, end) if plain else None}
+        else:
+            summary = _empty_summary(_previous_filter(previous))
+            FILE_SOURCES[name](workspace / name, summary)
+            entry = {}
+            actions[name] = "rebuilt"
+
+        entry.update({
+            "mtime_ns": stat.st_mtime_ns,
+            "summary": _dump_summary(summary),
+            "new_count": summary["new_count"],
+            "new": summary["new"],
+        })
+        sources[name] = entry
+
+    digest["updated"] = datetime.now().isoformat()
+    if persist and any(action != "cached" for action in actions.values()):
+        save_digest(workspace, digest)
+    return digest, actions
+
+# --- Rendering ---
+
+def _top(counters: Dict[str, int], n: int) -> str:
+    ranked = sorted(counters.items(), key=lambda item: (-item[1], item[0]))[:n]
+    return ", ".join(f"{value} ({count})" for value, count in ranked)
+
+def _render(target: str, digest: Dict[str, Any], n: int) -> str:
+    sources = digest["sources"]
+    merged: Dict[str, Counter] = {}
+    for entry in sources.values():
+        for name, values in entry["summary"]["counters"].items():
+            merged.setdefault(name, Counter()).update(values)
+
+    def count(name: str) -> int:
+        return sources[name]["summary"]["count"] if name in sources else 0
+
+    lines = [f"Workspace digest for {target}"]
+    lines.append(
+        f"Subdomains: {count('subdomains_raw.txt')}, live web hosts: {count('live_hosts_raw.txt')}, "
+        f"open ports: {count('nmap_scan.xml')}, nuclei results: {count('nuclei_results.jsonl')}"
+    )
+    missing = [name for name in list(LINE_SOURCES) + list(FILE_SOURCES) if name not in sources]
+    if missing:
+        lines.append(f"Not collected yet: {', '.join(missing)}")
+
+    notable = [item for entry in sources.values() for item in entry["summary"]["notable"]]
+    if notable:
+        rank = {severity: i for i, severity in enumerate(SEVERITY_ORDER)}
+        notable.sort(key=lambda item: rank.get(item["severity"], len(rank)))
+        lines.append("\nNotable findings:")
+        lines.extend(f"- [{item['severity']}] {item['text']}" for item in notable[:n])
+        if len(notable) > n:
+            lines.append(f"- ... {len(notable) - n} more")
+
+    new_lines = []
+    for name, entry in sources.items():
+        if entry.get("new_count"):
+            sample = ", ".join(entry["new"][:n])
+            more = f" (+{entry['new_count'] - n} more)" if entry["new_count"] > n else ""
+            new_lines.append(f"- {name}: {entry['new_count']} new: {sample}{more}")
+    if new_lines:
+        lines.append("\nNew since last run:")
+        lines.extend(new_lines)
+
+    for title, name in (
+        ("Top services", "services"),
+        ("Service products", "products"),
+        ("Technologies", "technologies"),
+        ("HTTP status codes", "status_codes"),
+        ("Nuclei severities", "severities"),
+    ):
+        if merged.get(name):
+            lines.append(f"\n{title}: {_top(merged[name], n)}")
+    return "\n".join(lines)
+
+def render_digest(target: str, digest: Dict[str, Any], max_tokens: int) -> str:
+    """Renders the digest as prompt text, shortening every list until it fits max_tokens."""
+    budget = max_tokens * CHARS_PER_TOKEN
+    n = 25
+    text = _render(target, digest, n)
+    while len(text) > budget and n > 1:
+        n //= 2
+        text = _render(target, digest, n)
+    if len(text) > budget:
+        text = text[:budget - 4].rsplit("\n", 1)[0] + "\n..."
+    return text
@@ -0,0 +1,96 @@
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+from typing import Any
+
+from rich.console import Console
+from rich.text import Text
+
+# In JSONL output mode every command group reports progress as one JSON object per
+# line on stdout instead of rich markup. Every event carries these common fields:
+#
+#   schema   SCHEMA_VERSION
+#   event    one of EVENT_TYPES
+#   ts       unix time in seconds
+#   run_id   HACKMATE_RUN_ID if set, else a random id per invocation
+#   seq      per-run sequence number, for ordering events from many runs
+#   pid      process id
+#
+# plus the event-specific fields listed in EVENT_TYPES. Durations are in milliseconds.
+
+SCHEMA_VERSION = 1
+
+EVENT_TYPES = {
+    "run_start": ("argv",),
+    "run_end": ("status", "duration_ms"),
+    "step_start": ("step", "target"),
+    "step_end": ("step", "target", "status", "duration_ms"),
+    "tool_start": ("tool", "args", "target"),
+    "tool_end": ("tool", "target", "status", "returncode", "duration_ms"),
+    "artifact_written": ("path", "target"),
+    "result": ("kind", "data"),
+    "error": ("message",),
+}
+
+OUTPUT_MODES = ("rich", "jsonl")
+
+_state = {
+    "mode": "rich",
+    "run_id": os.environ.get("HACKMATE_RUN_ID") or uuid.uuid4().hex,
+    "seq": 0,
+    "errors": 0,
+}
+_lock = threading.Lock()
+
+def set_output_mode(mode: str):
+    _state["mode"] = mode
+
+def jsonl_enabled() -> bool:
+    return _state["mode"] == "jsonl"
+
+def emit(event: str, **fields: Any):
+    """Writes a structured event to stdout in JSONL mode; does nothing otherwise."""
+    if _state["mode"] != "jsonl":
+        return
+    with _lock:
+        _state["seq"] += 1
+        record = {
+            "schema": SCHEMA_VERSION,
+            "event": event,
+            "ts": round(time.time(), 6),
+            "run_id": _state["run_id"],
+            "seq": _state["seq"],
+            "pid": os.getpid(),
+        }
+        record.update(fields)
+        sys.stdout.write(json.dumps(record, default=str) + "\n")
+        sys.stdout.flush()
+
+class EventConsole(Console):
+    """
+    The shared rich console. In JSONL mode printing returns before any markup
+    parsing or layout happens; errors are reported through error() instead.
+    """
+
+    def print(self, *objects: Any, **kwargs: Any):
+        if _state["mode"] == "jsonl":
+            return
+        super().print(*objects, **kwargs)
+
+console = EventConsole()
+
+def error(message: str, label: str = "Error:"):
+    """Reports an error: an 'error' event in JSONL mode, a red-labelled line otherwise."""
+    with _lock:
+        _state["errors"] += 1
+    if _state["mode"] == "jsonl":
+        emit("error", message=Text.from_markup(f"{label} {message}").plain)
+        return
+    console.print(f"[bold red]{label}[/bold red] {message}")
+
+def error_count() -> int:
+    """Number of errors reported so far in this run."""
+    return _state["errors"]
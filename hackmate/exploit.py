@@ -1,9 +1,7 @@
 import click
-from rich.console import Console
 from .config import get_workspace_path
-from .utils import run_external_tool
-
-console = Console()
+from .utils import run_external_tool, console, error
+from .events import emit
 
 @click.group()
 def exploit():
@@ -55,10 +53,11 @@ def shell(reverse, lhost, lport):
         
         console.print("\n[bold cyan]--- Reverse Shell Payloads ---[/bold cyan]")
         for name, payload in payloads.items():
+            emit("result", kind="payload", data={"name": name, "payload": payload})
             console.print(f"[bold]{name}:[/bold] {payload}")
         console.print("[bold cyan]------------------------------[/bold cyan]\n")
     else:
-        console.print("[bold red]Error:[/bold red] Must specify --reverse, --lhost, and --lport for shell generation.")
+        error("Must specify --reverse, --lhost, and --lport for shell generation.")
 
 if __name__ == '__main__':
     exploit()
@@ -1,51 +1,94 @@
 import click
+import time
 import yaml
-from rich.console import Console
+from rich.markup import escape
 from pathlib import Path
-from typing import Dict, Any, List
+from typing import Callable, Dict, Any, List
 from .config import get_workspace_path, CONFIG
-from .utils import console
-
-console = Console()
-
-# --- Plugin System (Placeholder) ---
-
-def load_plugins() -> Dict[str, Any]:
-    """Loads all plugins from the hackmate/plugins directory."""
-    plugins = {}
-    # In a real implementation, this would dynamically load Python modules
-    # For now, we'll use a simple placeholder
-    console.print("[dim]Plugin system loaded (placeholder).[/dim]")
-    return plugins
+from .utils import console, error
+from .events import emit, error_count
+from .plugins import load_plugin_step
+from .digest import update_digest, render_digest
+from .ai import load_backend, build_prompt
+
+# --- Flow Steps ---
+
+def _step_recon_subdomains(target: str, step_args: Dict[str, Any], confirm_execute: bool):
+    from .recon import subdomains
+    ctx = click.Context(subdomains, info_name='recon subdomains')
+    ctx.invoke(subdomains, target=target)
+
+def _step_recon_probe(target: str, step_args: Dict[str, Any], confirm_execute: bool):
+    from .recon import probe
+    ctx = click.Context(probe, info_name='recon probe')
+    ctx.invoke(probe, target=target)
+
+def _step_recon_resolve(target: str, step_args: Dict[str, Any], confirm_execute: bool):
+    from .recon import resolve
+    ctx = click.Context(resolve, info_name='recon resolve')
+    ctx.invoke(resolve, target=target, resolvers=tuple(step_args.get("resolvers", ())))
+
+def _step_scan_nmap(target: str, step_args: Dict[str, Any], confirm_execute: bool):
+    from .scan import nmap
+    ctx = click.Context(nmap, info_name='scan nmap')
+    # Example of passing args from flow to command
+    ports = step_args.get("ports", "80,443")
+    fast = step_args.get("fast", False)
+    full = step_args.get("full", False)
+    resolved = step_args.get("resolved", False)
+    ctx.invoke(nmap, target=target, ports=ports, fast=fast, full=full, resolved=resolved, confirm_scope=True, execute=confirm_execute)
+
+def _step_nuclei(target: str, step_args: Dict[str, Any], confirm_execute: bool):
+    from .web import nuclei
+    ctx = click.Context(nuclei, info_name='web nuclei')
+    # Severities and tags may be given as YAML lists or comma-separated strings
+    severity, tags = step_args.get("severity"), step_args.get("tags")
+    ctx.invoke(
+        nuclei,
+        target=target,
+        severity=",".join(severity) if isinstance(severity, list) else severity,
+        tags=",".join(tags) if isinstance(tags, list) else tags,
+        templates=step_args.get("templates"),
+        workers=step_args.get("workers", CONFIG["nuclei"]["workers"]),
+        rate_limit=step_args.get("rate_limit", CONFIG["nuclei"]["rate_limit"]),
+        hosts_per_batch=step_args.get("hosts_per_batch", CONFIG["nuclei"]["hosts_per_batch"]),
+        confirm_scope=True,
+        execute=confirm_execute,
+    )
+
+# Built-in steps. Plugins add more through the "hackmate.flow_steps" entry point
+# group or HACKMATE_STEPS in ~/.hackmate/plugins (see plugins.py).
+FLOW_STEPS: Dict[str, Callable[[str, Dict[str, Any], bool], None]] = {
+    "recon_subdomains": _step_recon_subdomains,
+    "recon_probe": _step_recon_probe,
+    "recon_resolve": _step_recon_resolve,
+    "scan_nmap": _step_scan_nmap,
+    "nuclei": _step_nuclei,
+}
 
 # --- Flow Engine ---
 
 def run_flow_step(step: Dict[str, Any], target: str, confirm_execute: bool):
     """Executes a single step in the flow."""
     step_name = list(step.keys())[0]
-    step_args = step[step_name]
+    step_args = step[step_name] or {}
     
     console.print(f"\n[bold magenta]>>> Executing Flow Step: {step_name}[/bold magenta]")
     
-    # Simple mapping to existing CLI commands (needs to be robust)
-    if step_name == "recon_subdomains":
-        from .recon import subdomains
-        ctx = click.Context(subdomains, info_name='recon subdomains')
-        ctx.invoke(subdomains, target=target)
-    elif step_name == "recon_probe":
-        from .recon import probe
-        ctx = click.Context(probe, info_name='recon probe')
-        ctx.invoke(probe, target=target)
-    elif step_name == "scan_nmap":
-        from .scan import nmap
-        ctx = click.Context(nmap, info_name='scan nmap')
-        # Example of passing args from flow to command
-        ports = step_args.get("ports", "80,443")
-        fast = step_args.get("fast", False)
-        full = step_args.get("full", False)
-        ctx.invoke(nmap, target=target, ports=ports, fast=fast, full=full, confirm_scope=True, execute=confirm_execute)
-    else:
-        console.print(f"[bold red]Error:[/bold red] Unknown flow step: {step_name}")
+    emit("step_start", step=step_name, target=target)
+    started = time.monotonic()
+    errors_before = error_count()
+    status = "error"
+    try:
+        step_func = FLOW_STEPS.get(step_name) or load_plugin_step(step_name)
+        if step_func is None:
+            error(f"Unknown flow step: {step_name}")
+            return
+        step_func(target, step_args, confirm_execute)
+        # Steps report failures through error() rather than raising
+        status = "ok" if error_count() == errors_before else "error"
+    finally:
+        emit("step_end", step=step_name, target=target, status=status, duration_ms=round((time.monotonic() - started) * 1000))
 
 @click.group()
 def flow():
@@ -63,18 +106,18 @@ def run(flow_file, target, confirm_scope, execute):
     console.print(f"[bold]Starting flow from {flow_path.name} for {target}...[/bold]")
     
     if not confirm_scope:
-        console.print("[bold red]Safety Error:[/bold red] Flows require the [bold]--confirm-scope[/bold] flag to run.")
+        error("Flows require the [bold]--confirm-scope[/bold] flag to run.", "Safety Error:")
         return
 
     try:
         with open(flow_path, "r") as f:
             flow_data = yaml.safe_load(f)
     except Exception as e:
-        console.print(f"[bold red]Error loading flow file:[/bold red] {e}")
+        error(str(e), "Error loading flow file:")
         return
 
     if "steps" not in flow_data or not isinstance(flow_data["steps"], list):
-        console.print("[bold red]Error:[/bold red] Flow file must contain a 'steps' list.")
+        error("Flow file must contain a 'steps' list.")
         return
 
     for step in flow_data["steps"]:
@@ -82,32 +125,46 @@ def run(flow_file, target, confirm_scope, execute):
 
     console.print(f"\n[bold green]Flow '{flow_data.get('name', 'Unnamed Flow')}' completed for {target}.[/bold green]")
 
-# --- AI Integration (Placeholder) ---
+# --- AI Integration ---
 
-def ai_suggest_next_steps(target: str):
+def ai_suggest_next_steps(target: str, show_digest: bool = False):
     """
     Uses AI to suggest the next steps based on current workspace artifacts.
+    The model sees the cached workspace digest (see digest.py), not the raw artifacts.
     """
-    if not CONFIG["ai"]["enabled"]:
+    ai_config = CONFIG["ai"]
+    if not ai_config["enabled"] and not show_digest:
         console.print("[bold yellow]AI is disabled.[/bold yellow] Enable it in ~/.hackmate/config.yaml to use this feature.")
         return
 
-    # Placeholder for OpenAI API call
     console.print(f"[bold cyan]AI Assistant:[/bold cyan] Analyzing workspace for {target}...")
-    
-    # In a real implementation, you would:
-    # 1. Read key artifacts (subdomains_raw.txt, live_hosts_raw.txt, nmap_scan.xml)
-    # 2. Construct a prompt summarizing the findings.
-    # 3. Call the OpenAI API with the prompt.
-    # 4. Print the AI's suggestion.
-    
-    console.print("[dim]Placeholder: AI suggests running 'hackmate web test -u https://example.com --dirs' based on live hosts found.[/dim]")
+    # A preview must not mark the current changes as seen
+    digest, actions = update_digest(get_workspace_path(target), persist=not show_digest)
+    changed = [name for name, action in actions.items() if action != "cached"]
+    console.print(f"[dim]Digest updated ({len(changed)} changed artifacts: {', '.join(changed) or 'none'}).[/dim]")
+    digest_text = render_digest(target, digest, ai_config["digest_tokens"])
+
+    if show_digest:
+        emit("result", kind="ai_digest", data={"target": target, "digest": digest_text, "artifacts": actions})
+        console.print(escape(digest_text))
+        return
+
+    try:
+        backend = load_backend(ai_config["backend"])
+        suggestion = backend(build_prompt(digest_text), ai_config)
+    except Exception as e:
+        error(f"AI backend '{ai_config['backend']}' failed: {e}")
+        return
+
+    emit("result", kind="ai_suggestion", data={"target": target, "backend": ai_config["backend"], "suggestion": suggestion})
+    console.print(escape(suggestion))
 
 @flow.command()
 @click.argument("target")
-def suggest(target):
+@click.option("--show-digest", is_flag=True, help="Print the workspace digest that would be sent to the model and exit.")
+def suggest(target, show_digest):
     """Uses AI to suggest the next steps based on current findings."""
-    ai_suggest_next_steps(target)
+    ai_suggest_next_steps(target, show_digest)
 
 if __name__ == '__main__':
     flow()
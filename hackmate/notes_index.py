@@ -0,0 +1,161 @@
+import sqlite3
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from tinydb import TinyDB
+
+from .config import HACKMATE_DB_FILE, HACKMATE_NOTES_INDEX
+
+# notes.json (TinyDB) stays the source of truth. This SQLite index mirrors it for
+# ranked full-text search (FTS5/bm25) and keyset pagination, and is brought up to
+# date whenever the size or mtime of notes.json changes.
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS notes (
+    doc_id INTEGER PRIMARY KEY,
+    target TEXT,
+    tag TEXT,
+    body TEXT,
+    timestamp TEXT,
+    workspace TEXT
+);
+CREATE INDEX IF NOT EXISTS notes_target ON notes (target, doc_id);
+"""
+
+FTS_SCHEMA = "CREATE VIRTUAL TABLE IF NOT EXISTS notes_fts USING fts5(body, tag, content='notes', content_rowid='doc_id')"
+
+# Markers wrapped around matched terms in search snippets
+HIGHLIGHT_START = "\x02"
+HIGHLIGHT_END = "\x03"
+
+def connect_index() -> sqlite3.Connection:
+    """Opens the notes index, creating its tables on first use."""
+    conn = sqlite3.connect(HACKMATE_NOTES_INDEX)
+    conn.row_factory = sqlite3.Row
+    conn.executescript(SCHEMA)
+    try:
+        conn.execute(FTS_SCHEMA)
+    except sqlite3.OperationalError:
+        pass # SQLite built without FTS5; search falls back to substring matching
+    return conn
+
+def _has_fts(conn: sqlite3.Connection) -> bool:
+    return conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'notes_fts'").fetchone() is not None
+
+def _source_signature() -> str:
+    try:
+        stat = HACKMATE_DB_FILE.stat()
+    except OSError:
+        return ""
+    return f"{stat.st_mtime_ns}:{stat.st_size}"
+
+def _row(doc_id: int, note: Dict[str, Any]) -> Tuple:
+    return (doc_id, note.get("target", ""), note.get("tag", ""), note.get("body", ""), note.get("timestamp", ""), note.get("workspace", ""))
+
+def _insert(conn: sqlite3.Connection, rows: List[Tuple]):
+    conn.executemany("INSERT OR REPLACE INTO notes VALUES (?, ?, ?, ?, ?, ?)", rows)
+    if _has_fts(conn):
+        conn.executemany("INSERT INTO notes_fts (rowid, body, tag) VALUES (?, ?, ?)", [(row[0], row[3], row[2]) for row in rows])
+
+def _delete(conn: sqlite3.Connection, rows: List[Tuple]):
+    """Removes indexed rows; the FTS table needs the old values to drop their terms."""
+    if _has_fts(conn):
+        conn.executemany("INSERT INTO notes_fts (notes_fts, rowid, body, tag) VALUES ('delete', ?, ?, ?)", [(row[0], row[3], row[2]) for row in rows])
+    conn.executemany("DELETE FROM notes WHERE doc_id = ?", [(row[0],) for row in rows])
+
+def _store_signature(conn: sqlite3.Connection):
+    conn.execute("INSERT OR REPLACE INTO meta VALUES ('source', ?)", (_source_signature(),))
+
+def sync_index(conn: sqlite3.Connection, db: TinyDB, force: bool = False):
+    """
+    Brings the index up to date with the notes database. When notes.json changed
+    outside of index_notes (e.g. edited by hand or a plugin), every note is
+    compared with its indexed row and only added, edited or deleted notes are
+    re-indexed. force rebuilds the whole index.
+    """
+    row = conn.execute("SELECT value FROM meta WHERE key = 'source'").fetchone()
+    if not force and row is not None and row["value"] == _source_signature():
+        return
+
+    current = {doc.doc_id: _row(doc.doc_id, doc) for doc in db.all()}
+    with conn:
+        if force:
+            conn.execute("DELETE FROM notes")
+            if _has_fts(conn):
+                conn.execute("INSERT INTO notes_fts (notes_fts) VALUES ('delete-all')")
+            _insert(conn, list(current.values()))
+        else:
+            indexed = {row[0]: tuple(row) for row in conn.execute("SELECT doc_id, target, tag, body, timestamp, workspace FROM notes")}
+            _delete(conn, [old for doc_id, old in indexed.items() if current.get(doc_id) != old])
+            _insert(conn, [new for doc_id, new in current.items() if indexed.get(doc_id) != new])
+        _store_signature(conn)
+
+def index_notes(conn: sqlite3.Connection, notes: Iterable[Tuple[int, Dict[str, Any]]]):
+    """Adds freshly inserted (doc_id, note) pairs to the index. Call sync_index before inserting them."""
+    with conn:
+        _insert(conn, [_row(doc_id, note) for doc_id, note in notes])
+        _store_signature(conn)
+
+def index_note(conn: sqlite3.Connection, doc_id: int, note: Dict[str, Any]):
+    index_notes(conn, [(doc_id, note)])
+
+def list_notes(conn: sqlite3.Connection, target: str, limit: int, cursor: int = 0) -> List[sqlite3.Row]:
+    """Returns up to 'limit' notes for a target with a doc_id greater than 'cursor'."""
+    return conn.execute(
+        "SELECT * FROM notes WHERE target = ? AND doc_id > ? ORDER BY doc_id LIMIT ?",
+        (target, cursor, limit),
+    ).fetchall()
+
+def count_notes(conn: sqlite3.Connection, target: str) -> int:
+    return conn.execute("SELECT COUNT(*) FROM notes WHERE target = ?", (target,)).fetchone()[0]
+
+def search_notes(
+    conn: sqlite3.Connection,
+    query: str,
+    target: Optional[str] = None,
+    tag: Optional[str] = None,
+    since: Optional[str] = None,
+    limit: int = 20,
+) -> List[sqlite3.Row]:
+    """
+    Searches note bodies and tags. Every query term must match (as a prefix), and
+    results are ranked by bm25 with tag matches weighted above body matches.
+    Each row carries a 'snippet' with matches wrapped in HIGHLIGHT_START/END.
+    """
+    terms = query.split()
+    if not terms:
+        return []
+
+    filters, params = [], []
+    if target:
+        filters.append("n.target = ?")
+        params.append(target.lower())
+    if tag:
+        filters.append("n.tag = ? COLLATE NOCASE")
+        params.append(tag)
+    if since:
+        filters.append("n.timestamp >= ?")
+        params.append(since)
+
+    if _has_fts(conn):
+        match = " ".join('"' + term.replace('"', '""') + '"*' for term in terms)
+        sql = (
+            "SELECT n.*, bm25(notes_fts, 1.0, 2.0) AS rank, "
+            f"snippet(notes_fts, 0, '{HIGHLIGHT_START}', '{HIGHLIGHT_END}', '...', 16) AS snippet "
+            "FROM notes_fts JOIN notes n ON n.doc_id = notes_fts.rowid "
+            "WHERE notes_fts MATCH ?"
+        )
+        params.insert(0, match)
+        order = "rank"
+    else:
+        sql = "SELECT n.*, 0 AS rank, n.body AS snippet FROM notes n WHERE 1"
+        for term in terms:
+            filters.insert(0, "(n.body LIKE ? OR n.tag LIKE ?)")
+            params[0:0] = [f"%{term}%", f"%{term}%"]
+        order = "n.doc_id DESC"
+
+    for condition in filters:
+        sql += f" AND {condition}"
+    sql += f" ORDER BY {order} LIMIT ?"
+    params.append(limit)
+    return conn.execute(sql, params).fetchall()
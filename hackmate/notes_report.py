@@ -1,17 +1,52 @@
 import click
 from rich.console import Console
 from rich.table import Table
+from rich.markup import escape
 from tinydb import Query
 from datetime import datetime
 from pathlib import Path
-from .config import get_workspace_path, get_notes_db
-from .utils import console
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+import hashlib
+import json
+import os
+from typing import Any, Dict, List
+from .config import get_workspace_path, get_notes_db, sanitize_target, CONFIG
+from .utils import console, record_artifact, error
+from .events import emit
+from .notes_index import connect_index, sync_index, index_note, index_notes, list_notes, count_notes, search_notes, HIGHLIGHT_START, HIGHLIGHT_END
 
 @click.group()
 def notes():
     """Manage notes and findings for targets."""
     pass
 
+def add_findings(target: str, findings: List[Dict[str, Any]]) -> int:
+    """
+    Bulk-adds tool findings (dicts with at least 'tag', 'body' and a unique 'key')
+    for a target, skipping keys that are already recorded.
+
+    :return: The number of findings added.
+    """
+    db = get_notes_db()
+    index = connect_index()
+    sync_index(index, db)
+    Note = Query()
+    known = {doc["key"] for doc in db.search((Note.target == target.lower()) & Note.key.exists())}
+
+    workspace = str(get_workspace_path(target))
+    new_notes = []
+    for finding in findings:
+        if finding["key"] in known:
+            continue
+        known.add(finding["key"])
+        new_notes.append(dict(finding, target=target.lower(), timestamp=datetime.now().isoformat(), workspace=workspace))
+
+    if new_notes:
+        doc_ids = db.insert_multiple(new_notes)
+        index_notes(index, zip(doc_ids, new_notes))
+    return len(new_notes)
+
 @notes.command()
 @click.argument("target")
 @click.option("-t", "--tag", required=True, help="A tag for the finding (e.g., 'XSS', 'RCE', 'Info').")
@@ -19,6 +54,8 @@ def notes():
 def add(target, tag, body):
     """Adds a new note/finding to the target's database."""
     db = get_notes_db()
+    index = connect_index()
+    sync_index(index, db)
     
     note = {
         "target": target.lower(),
@@ -28,95 +65,171 @@ def add(target, tag, body):
         "workspace": str(get_workspace_path(target)),
     }
     
-    db.insert(note)
+    doc_id = db.insert(note)
+    index_note(index, doc_id, note)
+    emit("result", kind="note_added", data=dict(note, id=doc_id))
     console.print(f"[bold green]Note added successfully for {target}[/bold green] with tag [yellow]{tag}[/yellow].")
 
 @notes.command()
 @click.argument("target")
-def list(target):
-    """Lists all notes/findings for a target."""
-    db = get_notes_db()
-    Note = Query()
-    findings = db.search(Note.target == target.lower())
+@click.option("--limit", type=int, default=50, show_default=True, help="Number of notes per page.")
+@click.option("--cursor", type=int, default=0, help="Show notes after this ID (printed at the end of the previous page).")
+def list(target, limit, cursor):
+    """Lists notes/findings for a target, one page at a time."""
+    index = connect_index()
+    sync_index(index, get_notes_db())
+    # One extra row tells whether another page exists
+    findings = list_notes(index, target.lower(), limit + 1, cursor)
+    has_more = len(findings) > limit
+    findings = findings[:limit]
     
     if not findings:
-        console.print(f"[bold yellow]No notes found for {target}.[/bold yellow]")
+        if cursor:
+            console.print(f"[bold yellow]No more notes for {target}.[/bold yellow]")
+        else:
+            console.print(f"[bold yellow]No notes found for {target}.[/bold yellow]")
         return
 
-    table = Table(title=f"Notes and Findings for {target}")
+    table = Table(title=f"Notes and Findings for {target} ({count_notes(index, target.lower())} total)")
     table.add_column("ID", style="cyan", no_wrap=True)
     table.add_column("Tag", style="magenta")
     table.add_column("Body", style="green")
     table.add_column("Timestamp", style="dim")
 
-    for i, finding in enumerate(findings):
+    for finding in findings:
+        emit("result", kind="note", data=dict(finding))
         table.add_row(
-            str(i + 1),
-            finding["tag"],
-            finding["body"],
+            str(finding["doc_id"]),
+            escape(finding["tag"]),
+            escape(finding["body"]),
             finding["timestamp"].split("T")[0] # Show only date
         )
         
     console.print(table)
 
+    if has_more:
+        next_cursor = findings[-1]["doc_id"]
+        emit("result", kind="next_cursor", data={"cursor": next_cursor})
+        console.print(f"[dim]Next page: hackmate notes list {target} --limit {limit} --cursor {next_cursor}[/dim]")
+
+@notes.command()
+@click.argument("query")
+@click.option("--target", help="Only search notes for this target.")
+@click.option("-t", "--tag", help="Only search notes with this tag.")
+@click.option("--since", type=click.DateTime(formats=["%Y-%m-%d"]), help="Only search notes added on or after this date (YYYY-MM-DD).")
+@click.option("--limit", type=int, default=20, show_default=True, help="Maximum number of results.")
+@click.option("--reindex", is_flag=True, help="Rebuild the search index from notes.json first.")
+def search(query, target, tag, since, limit, reindex):
+    """Full-text search over note bodies and tags, best matches first."""
+    index = connect_index()
+    sync_index(index, get_notes_db(), force=reindex)
+    results = search_notes(index, query, target=target, tag=tag, since=since.isoformat() if since else None, limit=limit)
+
+    if not results:
+        console.print(f"[bold yellow]No notes match '{escape(query)}'.[/bold yellow]")
+        return
+
+    table = Table(title=f"Search results for '{escape(query)}'")
+    table.add_column("ID", style="cyan", no_wrap=True)
+    table.add_column("Target", style="blue")
+    table.add_column("Tag", style="magenta")
+    table.add_column("Match")
+    table.add_column("Timestamp", style="dim")
+
+    for result in results:
+        emit("result", kind="search_hit", data={key: result[key] for key in result.keys() if key != "snippet"})
+        snippet = escape(result["snippet"]).replace(HIGHLIGHT_START, "[bold yellow]").replace(HIGHLIGHT_END, "[/bold yellow]")
+        table.add_row(
+            str(result["doc_id"]),
+            escape(result["target"]),
+            escape(result["tag"]),
+            snippet,
+            result["timestamp"].split("T")[0],
+        )
+
+    console.print(table)
+
 @click.group()
 def report():
     """Generate reports from target findings."""
     pass
 
-@report.command()
-@click.argument("target")
-@click.option("--pdf", is_flag=True, help="Convert the final Markdown report to PDF.")
-def generate(target, pdf):
-    """Generates a Markdown report for the target."""
-    console.print(f"[bold]Generating report for {target}...[/bold]")
-    workspace = get_workspace_path(target)
-    db = get_notes_db()
-    Note = Query()
-    findings = db.search(Note.target == target.lower())
-    
-    report_content = f"# Penetration Test Report - {target}\n\n"
-    report_content += f"**Date:** {datetime.now().strftime('%Y-%m-%d')}\n"
-    report_content += f"**Workspace:** {workspace}\n\n"
-    report_content += "## Executive Summary\n\n"
-    report_content += "*(To be filled in manually or by AI assistance in Phase 4)*\n\n"
-    
-    report_content += "## Findings\n\n"
-    
-    if not findings:
-        report_content += "No structured findings were recorded.\n\n"
-    else:
-        for i, finding in enumerate(findings):
-            report_content += f"### {i+1}. {finding['tag']}\n\n"
-            report_content += f"**Severity:** Medium (Placeholder)\n"
-            report_content += f"**Location:** {finding['body']}\n"
-            report_content += f"**Timestamp:** {finding['timestamp']}\n\n"
-            report_content += "#### Description\n"
-            report_content += "*(Detailed description of the vulnerability)*\n\n"
-            report_content += "#### Proof of Concept\n"
-            report_content += "*(Steps to reproduce or PoC code)*\n\n"
-            report_content += "#### Remediation\n"
-            report_content += "*(Suggested fix)*\n\n"
-
-    # Add artifacts section
-    report_content += "## Artifacts and Raw Data\n\n"
-    report_content += "The following files are available in the workspace:\n"
-    
-    artifact_list = [f"- {f.name}" for f in workspace.iterdir() if f.is_file()]
-    report_content += "\n".join(artifact_list)
-    report_content += "\n\n"
+# Bump when the report layout changes so unchanged workspaces are re-rendered once
+REPORT_FORMAT_VERSION = 1
+REPORT_STATE_FILE = ".report_state.json"
+
+def _report_fingerprint(findings: List[Dict[str, Any]], workspace: Path, target: str, pdf: bool) -> str:
+    """Hashes everything a report is rendered from: findings, artifact listing and options."""
+    report_names = {f"{workspace.name}_report.md", f"{workspace.name}_report.pdf"}
+    artifacts = sorted(
+        (entry.name, entry.stat().st_size, entry.stat().st_mtime_ns)
+        for entry in os.scandir(workspace)
+        if entry.is_file() and not entry.name.startswith(".") and entry.name not in report_names
+    )
+    payload = json.dumps([REPORT_FORMAT_VERSION, pdf, findings, artifacts], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
 
-    md_path = workspace / f"{target}_report.md"
-    with open(md_path, "w") as f:
-        f.write(report_content)
+def render_report(target: str, findings: List[Dict[str, Any]], workspace_dir: str, pdf: bool, force: bool = False) -> Dict[str, Any]:
+    """
+    Renders the Markdown (and optionally PDF) report for one target workspace,
+    named after the workspace directory. Runs in a worker process, so it takes
+    plain data and reports back instead of printing.
+
+    :return: {"target", "status" ('rendered', 'skipped' or 'error'), "paths", "error"}.
+    """
+    workspace = Path(workspace_dir)
+    result = {"target": target, "status": "rendered", "paths": [], "error": None}
+    try:
+        fingerprint = _report_fingerprint(findings, workspace, target, pdf)
+        state_path = workspace / REPORT_STATE_FILE
+        md_path = workspace / f"{workspace.name}_report.md"
+        if not force and md_path.exists() and state_path.exists():
+            try:
+                with open(state_path, "r") as f:
+                    unchanged = json.load(f).get("fingerprint") == fingerprint
+            except ValueError:
+                unchanged = False # Unreadable state; render again
+            if unchanged:
+                result["status"] = "skipped"
+                return result
+
+        report_content = f"# Penetration Test Report - {target}\n\n"
+        report_content += f"**Date:** {datetime.now().strftime('%Y-%m-%d')}\n"
+        report_content += f"**Workspace:** {workspace}\n\n"
+        report_content += "## Executive Summary\n\n"
+        report_content += "*(To be filled in manually or by AI assistance in Phase 4)*\n\n"
+        
+        report_content += "## Findings\n\n"
         
-    console.print(f"[bold green]Markdown report generated:[/bold green] {md_path}")
+        if not findings:
+            report_content += "No structured findings were recorded.\n\n"
+        else:
+            for i, finding in enumerate(findings):
+                report_content += f"### {i+1}. {finding['tag']}\n\n"
+                report_content += f"**Severity:** {finding.get('severity', 'Medium (Placeholder)').capitalize()}\n"
+                report_content += f"**Location:** {finding['body']}\n"
+                report_content += f"**Timestamp:** {finding['timestamp']}\n\n"
+                report_content += "#### Description\n"
+                report_content += "*(Detailed description of the vulnerability)*\n\n"
+                report_content += "#### Proof of Concept\n"
+                report_content += "*(Steps to reproduce or PoC code)*\n\n"
+                report_content += "#### Remediation\n"
+                report_content += "*(Suggested fix)*\n\n"
+
+        # Add artifacts section
+        report_content += "## Artifacts and Raw Data\n\n"
+        report_content += "The following files are available in the workspace:\n"
+        
+        artifact_list = [f"- {f.name}" for f in sorted(workspace.iterdir()) if f.is_file() and not f.name.startswith(".")]
+        report_content += "\n".join(artifact_list)
+        report_content += "\n\n"
+
+        with open(md_path, "w") as f:
+            f.write(report_content)
+        result["paths"].append(str(md_path))
 
-    if pdf:
-        console.print("[bold yellow]Attempting to convert Markdown to PDF...[/bold yellow]")
-        # Use the utility function to convert MD to PDF
-        try:
-            pdf_path = workspace / f"{target}_report.pdf"
+        if pdf:
+            pdf_path = workspace / f"{workspace.name}_report.pdf"
             # This utility is a placeholder for a real conversion tool like manus-md-to-pdf
             # Since we cannot run the actual utility here, we'll simulate the command
             # and rely on the final packaging to include the necessary instructions.
@@ -126,10 +239,75 @@ def generate(target, pdf):
             
             # For now, we'll just create an empty PDF file as a placeholder
             Path(pdf_path).touch()
-            
-            console.print(f"[bold green]PDF report generated:[/bold green] {pdf_path}")
-        except Exception as e:
-            console.print(f"[bold red]PDF Conversion Error:[/bold red] Could not convert to PDF. Ensure 'manus-md-to-pdf' or a similar tool is available. Error: {e}")
+            result["paths"].append(str(pdf_path))
+
+        # Fingerprint again: the report itself may now appear in the artifact listing
+        with open(state_path, "w") as f:
+            json.dump({"fingerprint": _report_fingerprint(findings, workspace, target, pdf)}, f)
+    except Exception as e:
+        result["status"] = "error"
+        result["error"] = str(e)
+    return result
+
+@report.command()
+@click.argument("targets", nargs=-1)
+@click.option("--all", "all_targets", is_flag=True, help="Generate reports for every target with findings or a workspace.")
+@click.option("--pdf", is_flag=True, help="Convert the final Markdown report to PDF.")
+@click.option("--force", is_flag=True, help="Re-render reports even if their findings and artifacts are unchanged.")
+@click.option("--workers", type=int, default=os.cpu_count() or 1, show_default=True, help="Number of processes rendering reports in parallel.")
+def generate(targets, all_targets, pdf, force, workers):
+    """Generates Markdown reports for one or more targets."""
+    if not targets and not all_targets:
+        error("Specify one or more targets, or use --all.")
+        return
+
+    # Read every finding once and group them by workspace. Targets such as
+    # 'host:8080' and 'host_8080' share a workspace and so share one report.
+    findings_by_workspace: Dict[str, List[Dict[str, Any]]] = {}
+    targets_by_workspace: Dict[str, str] = {}
+    for doc in get_notes_db().all():
+        if not doc.get("target"):
+            continue
+        name = sanitize_target(doc["target"])
+        findings_by_workspace.setdefault(name, []).append(dict(doc))
+        targets_by_workspace[name] = min(doc["target"], targets_by_workspace.get(name, doc["target"]))
+
+    if all_targets:
+        workspace_root = Path(CONFIG["workspace_dir"])
+        names = {entry.name for entry in os.scandir(workspace_root) if entry.is_dir()}
+        names.discard("local_search")
+        targets = [targets_by_workspace.get(name, name) for name in sorted(names | set(findings_by_workspace))]
+
+    jobs_by_workspace = {}
+    for target in targets:
+        name = sanitize_target(target)
+        if name not in jobs_by_workspace:
+            jobs_by_workspace[name] = (target, findings_by_workspace.get(name, []), str(get_workspace_path(target)), pdf, force)
+    jobs = [*jobs_by_workspace.values()]
+    console.print(f"[bold]Generating reports for {len(jobs)} target(s)...[/bold]")
+
+    if len(jobs) == 1 or workers <= 1:
+        results = [render_report(*job) for job in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = pool.map(render_report, *zip(*jobs), chunksize=max(1, len(jobs) // (workers * 4)))
+
+    counts = defaultdict(int)
+    for result in results:
+        counts[result["status"]] += 1
+        if result["status"] == "error":
+            error(f"Report for {result['target']} failed: {result['error']}")
+            continue
+        emit("result", kind="report", data=result)
+        for path in result["paths"]:
+            if result["status"] == "rendered":
+                record_artifact(Path(path), result["target"])
+            label = "PDF" if path.endswith(".pdf") else "Markdown"
+            console.print(f"[bold green]{label} report generated:[/bold green] {path}")
+        if result["status"] == "skipped":
+            console.print(f"[dim]Skipped {result['target']}: findings and artifacts unchanged since the last report.[/dim]")
+
+    console.print(f"[bold green]Reports complete.[/bold green] {counts['rendered']} rendered, {counts['skipped']} unchanged, {counts['error']} failed.")
 
 if __name__ == '__main__':
     notes()
@@ -1,9 +1,6 @@
 import click
-from rich.console import Console
 from .config import get_workspace_path
-from .utils import run_external_tool
-
-console = Console()
+from .utils import run_external_tool, console, error
 
 @click.group()
 def osint():
@@ -33,7 +30,7 @@ def profile(target, github, shodan, confirm_scope):
         console.print("[dim]Placeholder: Use Shodan API to query host IP and save results.[/dim]")
 
     if not github and not shodan:
-        console.print("[bold red]Error:[/bold red] Please specify at least one OSINT option, e.g., --github or --shodan.")
+        error("Please specify at least one OSINT option, e.g., --github or --shodan.")
         return
 
     console.print(f"[bold green]OSINT profiling complete.[/bold green] Results saved to {workspace}")
@@ -0,0 +1,268 @@
+import ast
+import importlib
+import importlib.util
+import json
+import sys
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional
+
+import click
+
+from .config import HACKMATE_PLUGIN_DIR, HACKMATE_PLUGIN_REGISTRY
+from .utils import console, error
+
+# Plugins declare commands and flow steps in one of two ways:
+#
+# 1. Installed packages expose entry points in the "hackmate.commands" and
+#    "hackmate.flow_steps" groups, e.g. ``shodan = hackmate_shodan.cli:shodan``.
+# 2. Local plugins live in ~/.hackmate/plugins as ``name.py`` or ``name/__init__.py``
+#    and declare module-level literals that are read with ``ast`` (never imported):
+#        HACKMATE_COMMANDS = {"shodan": "shodan_command"}
+#        HACKMATE_STEPS = {"shodan_enrich": "enrich_step"}
+#
+# Discovery results are cached in HACKMATE_PLUGIN_REGISTRY and rebuilt only when
+# the mtimes of the plugin directory or site-packages change. Plugin modules are
+# imported the first time one of their commands or steps is actually used.
+
+REGISTRY_VERSION = 1
+ENTRY_POINT_GROUPS = {
+    "command": "hackmate.commands",
+    "step": "hackmate.flow_steps",
+}
+DECLARATION_NAMES = {
+    "command": "HACKMATE_COMMANDS",
+    "step": "HACKMATE_STEPS",
+}
+
+_registry: Optional[Dict[str, Any]] = None
+_resolved: Dict[str, Any] = {}
+
+# --- Discovery ---
+
+def _plugin_sources() -> Dict[str, Path]:
+    """Returns the local plugin name -> source file mapping."""
+    sources = {}
+    if not HACKMATE_PLUGIN_DIR.is_dir():
+        return sources
+    for path in sorted(HACKMATE_PLUGIN_DIR.iterdir()):
+        if path.name.startswith((".", "_")):
+            continue
+        if path.is_file() and path.suffix == ".py":
+            sources[path.stem] = path
+        elif path.is_dir() and (path / "__init__.py").is_file():
+            sources[path.name] = path / "__init__.py"
+    return sources
+
+def _fingerprint() -> Dict[str, int]:
+    """
+    Collects the mtimes that decide whether the cached registry is stale.
+    Installing a distribution touches its site-packages directory; adding or
+    editing a local plugin touches the plugin directory or the plugin file.
+    """
+    paths = [HACKMATE_PLUGIN_DIR]
+    paths.extend(Path(entry) for entry in sys.path if Path(entry).name in ("site-packages", "dist-packages"))
+    paths.extend(_plugin_sources().values())
+
+    fingerprint = {}
+    for path in paths:
+        try:
+            fingerprint[str(path)] = path.stat().st_mtime_ns
+        except OSError:
+            continue
+    return fingerprint
+
+def _first_line(text: str) -> str:
+    return text.strip().splitlines()[0] if text and text.strip() else ""
+
+def _discover_entry_points() -> Dict[str, Dict[str, Any]]:
+    """Reads plugin entry points from installed distributions without importing them."""
+    from importlib.metadata import entry_points
+
+    found = {"command": {}, "step": {}}
+    for kind, group in ENTRY_POINT_GROUPS.items():
+        for ep in entry_points(group=group):
+            module, _, attr = ep.value.partition(":")
+            plugin = ep.dist.name if getattr(ep, "dist", None) else module.split(".")[0]
+            found[kind][ep.name] = {
+                "plugin": plugin,
+                "source": "entry_point",
+                "module": module.strip(),
+                "attr": attr.split("[")[0].strip(),
+                "path": None,
+                "help": f"Plugin command from {plugin}.",
+            }
+    return found
+
+def _discover_local_plugins() -> Dict[str, Dict[str, Any]]:
+    """Parses local plugin sources for their declarations without executing them."""
+    found = {"command": {}, "step": {}}
+    for plugin, source in _plugin_sources().items():
+        try:
+            tree = ast.parse(source.read_text(encoding="utf-8"), filename=str(source))
+        except (OSError, SyntaxError, UnicodeDecodeError) as e:
+            error(f"Could not parse {source}: {e}", "Plugin Error:")
+            continue
+
+        declarations = {}
+        docstrings = {}
+        for node in tree.body:
+            if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                docstrings[node.name] = ast.get_docstring(node) or ""
+            elif (
+                isinstance(node, ast.Assign)
+                and len(node.targets) == 1
+                and isinstance(node.targets[0], ast.Name)
+                and node.targets[0].id in DECLARATION_NAMES.values()
+            ):
+                try:
+                    declarations[node.targets[0].id] = ast.literal_eval(node.value)
+                except ValueError:
+                    error(f"{node.targets[0].id} in {source} must be a literal dict.", "Plugin Error:")
+
+        for kind, declaration_name in DECLARATION_NAMES.items():
+            declared = declarations.get(declaration_name) or {}
+            if not isinstance(declared, dict):
+                continue
+            for name, attr in declared.items():
+                found[kind][str(name)] = {
+                    "plugin": plugin,
+                    "source": "directory",
+                    "module": f"hackmate_plugin_{plugin}",
+                    "attr": str(attr),
+                    "path": str(source),
+                    "help": _first_line(docstrings.get(str(attr), "")),
+                }
+    return found
+
+def _build_registry() -> Dict[str, Any]:
+    registry = {"version": REGISTRY_VERSION, "fingerprint": _fingerprint(), "command": {}, "step": {}}
+    # Local plugins are discovered last so they can override an installed plugin.
+    for found in (_discover_entry_points(), _discover_local_plugins()):
+        for kind in ("command", "step"):
+            registry[kind].update(found[kind])
+    return registry
+
+def load_plugins(refresh: bool = False) -> Dict[str, Any]:
+    """
+    Returns the plugin registry, rebuilding the on-disk cache if it is stale.
+    The registry maps 'command' and 'step' to {name: declaration} dicts.
+    """
+    global _registry
+    if _registry is not None and not refresh:
+        return _registry
+
+    registry = None
+    if not refresh and HACKMATE_PLUGIN_REGISTRY.exists():
+        try:
+            with open(HACKMATE_PLUGIN_REGISTRY, "r") as f:
+                registry = json.load(f)
+        except (OSError, ValueError):
+            registry = None
+        if registry and (registry.get("version") != REGISTRY_VERSION or registry.get("fingerprint") != _fingerprint()):
+            registry = None
+
+    if registry is None:
+        registry = _build_registry()
+        try:
+            with open(HACKMATE_PLUGIN_REGISTRY, "w") as f:
+                json.dump(registry, f, indent=4)
+        except OSError as e:
+            console.print(f"[bold yellow]Warning:[/bold yellow] Could not write plugin registry: {e}")
+
+    _registry = registry
+    return registry
+
+# --- Lazy Loading ---
+
+def _import_plugin_module(declaration: Dict[str, Any]):
+    module_name = declaration["module"]
+    if module_name in sys.modules:
+        return sys.modules[module_name]
+    if declaration["source"] != "directory":
+        return importlib.import_module(module_name)
+
+    path = Path(declaration["path"])
+    search_locations = [str(path.parent)] if path.name == "__init__.py" else None
+    spec = importlib.util.spec_from_file_location(module_name, path, submodule_search_locations=search_locations)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[module_name] = module
+    try:
+        spec.loader.exec_module(module)
+    except BaseException:
+        del sys.modules[module_name]
+        raise
+    return module
+
+def _resolve(kind: str, name: str) -> Optional[Any]:
+    """Imports the plugin behind a command or step and returns the declared object."""
+    key = f"{kind}:{name}"
+    if key in _resolved:
+        return _resolved[key]
+
+    declaration = load_plugins()[kind].get(name)
+    if declaration is None:
+        return None
+
+    try:
+        obj = _import_plugin_module(declaration)
+        for part in declaration["attr"].split("."):
+            obj = getattr(obj, part)
+    except Exception as e:
+        error(f"Could not load {kind} '{name}' from plugin '{declaration['plugin']}': {e}", "Plugin Error:")
+        return None
+
+    _resolved[key] = obj
+    return obj
+
+def load_plugin_command(name: str) -> Optional[click.Command]:
+    """Returns the click command registered by a plugin, importing it on first use."""
+    command = _resolve("command", name)
+    if command is not None and not isinstance(command, click.Command):
+        error(f"Plugin command '{name}' is not a click command.", "Plugin Error:")
+        return None
+    return command
+
+def load_plugin_step(name: str) -> Optional[Callable[[str, Dict[str, Any], bool], None]]:
+    """Returns the flow step callable registered by a plugin, importing it on first use."""
+    step = _resolve("step", name)
+    if step is not None and not callable(step):
+        error(f"Plugin flow step '{name}' is not callable.", "Plugin Error:")
+        return None
+    return step
+
+class PluginGroup(click.Group):
+    """
+    A click group that also exposes plugin commands. Help output is rendered
+    from the cached registry so listing commands never imports a plugin.
+    """
+
+    def list_commands(self, ctx):
+        return sorted(set(super().list_commands(ctx)) | set(load_plugins()["command"]))
+
+    def get_command(self, ctx, cmd_name):
+        command = super().get_command(ctx, cmd_name)
+        if command is None and cmd_name in load_plugins()["command"]:
+            command = load_plugin_command(cmd_name)
+        return command
+
+    def format_commands(self, ctx, formatter):
+        plugin_commands = load_plugins()["command"]
+        commands = []
+        for name in self.list_commands(ctx):
+            if name in self.commands:
+                if not self.commands[name].hidden:
+                    commands.append((name, self.commands[name]))
+            else:
+                commands.append((name, plugin_commands[name]["help"]))
+
+        if not commands:
+            return
+        limit = formatter.width - 6 - max(len(name) for name, _ in commands)
+        rows = []
+        for name, command in commands:
+            if isinstance(command, click.Command):
+                rows.append((name, command.get_short_help_str(limit)))
+            else:
+                rows.append((name, click.utils.make_default_short_help(command, limit)))
+        with formatter.section("Commands"):
+            formatter.write_dl(rows)
@@ -1,9 +1,10 @@
 import click
-from rich.console import Console
 from .config import get_workspace_path, CONFIG
-from .utils import run_external_tool, save_json_artifact
-
-console = Console()
+from .utils import run_external_tool, save_json_artifact, console, error
+from .events import emit
+from .resolve import HOST_IP_MAP, resolve_with_cache
+from .artifacts import ensure_plain, find_artifact, open_artifact
+from .scope import load_scope, filter_artifact, report_filter, host_from_httpx_line
 
 @click.group()
 def recon():
@@ -20,6 +21,11 @@ def subdomains(target):
     console.print(f"[bold]Starting passive subdomain enumeration for {target}...[/bold]")
     workspace = get_workspace_path(target)
     
+    scope = load_scope(target, workspace)
+    if not scope.overlaps_domain(target):
+        error(f"Neither {target} nor any of its subdomains is in scope.", "Safety Error:")
+        return
+
     tool_path = CONFIG["tools"]["subfinder"]
     output_file = "subdomains_raw.txt"
     
@@ -35,8 +41,11 @@ def subdomains(target):
         target=target,
         workspace_path=workspace,
         output_filename=output_file,
-        check_scope=True,
+        check_scope=False, # Passive; checked above against the domain and its subdomains
     )
+
+    kept, dropped = filter_artifact(workspace / output_file, scope)
+    report_filter(output_file, kept, dropped)
     
     console.print(f"[bold green]Subdomain enumeration complete.[/bold green] Results saved to {workspace / output_file}")
 
@@ -50,11 +59,16 @@ def probe(target):
     console.print(f"[bold]Starting live host probing for {target}...[/bold]")
     workspace = get_workspace_path(target)
     
-    input_file = workspace / "subdomains_raw.txt"
+    # httpx reads the list itself, so a compressed artifact is restored first
+    input_file = ensure_plain(workspace / "subdomains_raw.txt")
     if not input_file.exists():
-        console.print(f"[bold red]Error:[/bold red] Input file {input_file} not found. Run 'hackmate recon subdomains {target}' first.")
+        error(f"Input file {input_file} not found. Run 'hackmate recon subdomains {target}' first.")
         return
 
+    # Never hand out-of-scope names to httpx, even if the input was edited by hand
+    scope = load_scope(target, workspace)
+    filter_artifact(input_file, scope)
+
     tool_path = CONFIG["tools"]["httpx"]
     output_file = "live_hosts_raw.txt"
     
@@ -75,8 +89,45 @@ def probe(target):
         workspace_path=workspace,
         output_filename=output_file,
     )
+
+    kept, dropped = filter_artifact(workspace / output_file, scope, host_from_httpx_line)
+    report_filter(output_file, kept, dropped)
     
     console.print(f"[bold green]Live host probing complete.[/bold green] Results saved to {workspace / output_file}")
 
+@recon.command()
+@click.argument("target")
+@click.option("--resolver", "resolvers", multiple=True, help="DNS resolver as IP or IP:PORT (repeatable). Defaults to dns.resolvers in the config.")
+def resolve(target, resolvers):
+    """
+    Resolves collected subdomains to IPs and writes a host-to-IP map.
+    Requires subdomains_raw.txt to exist in the workspace.
+    """
+    console.print(f"[bold]Resolving subdomains for {target}...[/bold]")
+    workspace = get_workspace_path(target)
+
+    input_file = workspace / "subdomains_raw.txt"
+    if find_artifact(input_file) is None:
+        error(f"Input file {input_file} not found. Run 'hackmate recon subdomains {target}' first.")
+        return
+
+    scope = load_scope(target, workspace)
+    with open_artifact(input_file) as f:
+        hosts = [line.strip() for line in f if line.strip() and scope.contains(line)]
+
+    try:
+        host_map = resolve_with_cache(hosts, resolvers=list(resolvers) or None)
+    except ValueError as e:
+        error(str(e))
+        return
+    # Shared CDN/load-balancer IPs stay in scope through their hostnames unless explicitly excluded
+    host_map = {host: [ip for ip in ips if not scope.excludes_ip(ip)] for host, ips in host_map.items()}
+
+    save_json_artifact(host_map, HOST_IP_MAP, workspace, target)
+    resolved = sum(1 for ips in host_map.values() if ips)
+    unique_ips = len({ip for ips in host_map.values() for ip in ips})
+    emit("result", kind="resolve", data={"target": target, "hosts": len(host_map), "resolved": resolved, "unique_ips": unique_ips})
+    console.print(f"[bold green]Resolution complete.[/bold green] {resolved}/{len(host_map)} hosts resolved to {unique_ips} unique IPs.")
+
 if __name__ == '__main__':
     recon()
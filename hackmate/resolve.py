@@ -0,0 +1,292 @@
+import asyncio
+import json
+import os
+import random
+import socket
+import struct
+import time
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from .config import CONFIG, HACKMATE_DNS_CACHE
+from .utils import console
+
+HOST_IP_MAP = "host_ip_map.json"
+RESOLVED_IPS = "resolved_ips.txt"
+RESOLVED_IPS6 = "resolved_ips6.txt"
+
+QTYPE_A = 1
+QTYPE_AAAA = 28
+RECORD_TYPES = {"A": QTYPE_A, "AAAA": QTYPE_AAAA}
+RCODE_NXDOMAIN = 3
+# TTL used for NXDOMAIN/NODATA answers, which carry no address records
+NEGATIVE_TTL = 300
+
+# --- Wire Format ---
+
+def build_query(query_id: int, name: str, qtype: int = QTYPE_A) -> bytes:
+    """Builds a recursive DNS query packet for a single name."""
+    qname = b""
+    for label in name.rstrip(".").encode("idna").split(b"."):
+        if not label or len(label) > 63:
+            raise ValueError(f"Invalid DNS name: {name}")
+        qname += bytes([len(label)]) + label
+    header = struct.pack("!HHHHHH", query_id, 0x0100, 1, 0, 0, 0)
+    return header + qname + b"\x00" + struct.pack("!HH", qtype, 1)
+
+def _skip_name(data: bytes, offset: int) -> int:
+    while True:
+        length = data[offset]
+        if length & 0xC0 == 0xC0:
+            return offset + 2
+        if length == 0:
+            return offset + 1
+        offset += length + 1
+
+def parse_response(data: bytes) -> Tuple[int, int, List[str], Optional[int]]:
+    """
+    Parses a DNS response.
+
+    :return: (query id, rcode, addresses, minimum TTL of the address records or None).
+    """
+    query_id, flags, qdcount, ancount, _, _ = struct.unpack_from("!HHHHHH", data)
+    offset = 12
+    for _ in range(qdcount):
+        offset = _skip_name(data, offset) + 4
+
+    addresses = []
+    ttls = []
+    for _ in range(ancount):
+        offset = _skip_name(data, offset)
+        rtype, _, ttl, rdlength = struct.unpack_from("!HHIH", data, offset)
+        offset += 10
+        rdata = data[offset:offset + rdlength]
+        offset += rdlength
+        if rtype == QTYPE_A and rdlength == 4:
+            addresses.append(socket.inet_ntop(socket.AF_INET, rdata))
+            ttls.append(ttl)
+        elif rtype == QTYPE_AAAA and rdlength == 16:
+            addresses.append(socket.inet_ntop(socket.AF_INET6, rdata))
+            ttls.append(ttl)
+    return query_id, flags & 0x0F, addresses, min(ttls) if ttls else None
+
+def parse_resolver(spec: str) -> Tuple[str, int]:
+    """Parses 'ip', 'ip:port' or '[ipv6]:port' into an address tuple."""
+    if spec.startswith("["):
+        host, _, port = spec[1:].partition("]")
+        return host, int(port.lstrip(":") or 53)
+    if spec.count(":") == 1:
+        host, _, port = spec.partition(":")
+        return host, int(port)
+    return spec, 53
+
+# --- Async Client ---
+
+class _DNSProtocol(asyncio.DatagramProtocol):
+    """Matches UDP responses from one resolver to pending queries by query id."""
+
+    def __init__(self):
+        self.transport = None
+        self.pending: Dict[int, asyncio.Future] = {}
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data, addr):
+        if len(data) < 12:
+            return
+        future = self.pending.get(struct.unpack_from("!H", data)[0])
+        if future is not None and not future.done():
+            future.set_result(data)
+
+    def error_received(self, exc):
+        pass
+
+    def new_query_id(self) -> int:
+        while True:
+            query_id = random.getrandbits(16)
+            if query_id not in self.pending:
+                return query_id
+
+async def _query(protocol: _DNSProtocol, name: str, qtype: int, timeout: float) -> Optional[Tuple[int, List[str], Optional[int]]]:
+    query_id = protocol.new_query_id()
+    future = asyncio.get_running_loop().create_future()
+    protocol.pending[query_id] = future
+    try:
+        protocol.transport.sendto(build_query(query_id, name, qtype))
+        data = await asyncio.wait_for(future, timeout)
+        _, rcode, addresses, ttl = parse_response(data)
+        return rcode, addresses, ttl
+    except (asyncio.TimeoutError, struct.error, IndexError):
+        return None
+    finally:
+        protocol.pending.pop(query_id, None)
+
+async def resolve_hosts(
+    hosts: Iterable[str],
+    resolvers: List[str],
+    concurrency: int = 200,
+    timeout: float = 2,
+    retries: int = 2,
+    qtype: int = QTYPE_A,
+) -> Dict[str, Tuple[List[str], int]]:
+    """
+    Resolves hosts concurrently, spreading queries across the resolvers and
+    retrying timeouts and server failures on the next resolver.
+
+    :return: {host: (addresses, ttl)}. Hosts that never got an answer are omitted.
+    """
+    loop = asyncio.get_running_loop()
+    protocols = []
+    for spec in resolvers:
+        address = parse_resolver(spec)
+        family = socket.AF_INET6 if ":" in address[0] else socket.AF_INET
+        transport, protocol = await loop.create_datagram_endpoint(_DNSProtocol, remote_addr=address, family=family)
+        protocols.append(protocol)
+
+    semaphore = asyncio.Semaphore(concurrency)
+    results: Dict[str, Tuple[List[str], int]] = {}
+
+    async def resolve_one(index: int, host: str):
+        async with semaphore:
+            for attempt in range(retries + 1):
+                try:
+                    answer = await _query(protocols[(index + attempt) % len(protocols)], host, qtype, timeout)
+                except ValueError:
+                    return
+                if answer is None:
+                    continue
+                rcode, addresses, ttl = answer
+                if rcode == 0:
+                    results[host] = (addresses, ttl if ttl is not None else NEGATIVE_TTL)
+                    return
+                if rcode == RCODE_NXDOMAIN:
+                    results[host] = ([], NEGATIVE_TTL)
+                    return
+
+    try:
+        await asyncio.gather(*(resolve_one(i, host) for i, host in enumerate(hosts)))
+    finally:
+        for protocol in protocols:
+            protocol.transport.close()
+    return results
+
+# --- Cache ---
+
+def _cache_key(resolvers: List[str], record_types: List[str]) -> str:
+    """Cache partition for a resolver set and record types, so answers from one
+    resolver (e.g. a split-horizon internal one) are never served for another."""
+    return ",".join(sorted(resolvers)) + "|" + ",".join(sorted(record_types))
+
+def load_dns_cache(cache_file: Path = HACKMATE_DNS_CACHE) -> Dict[str, Dict[str, Dict]]:
+    """Loads the on-disk DNS cache ({resolver set: {host: entry}}), dropping expired entries."""
+    if not cache_file.exists():
+        return {}
+    try:
+        with open(cache_file, "r") as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    now = time.time()
+    live = {}
+    for key, entries in cache.items():
+        # Skips entries of the older flat {host: entry} format
+        if not isinstance(entries, dict) or "expires" in entries:
+            continue
+        entries = {host: entry for host, entry in entries.items() if entry.get("expires", 0) > now}
+        if entries:
+            live[key] = entries
+    return live
+
+def save_dns_cache(cache: Dict[str, Dict[str, Dict]], cache_file: Path = HACKMATE_DNS_CACHE):
+    tmp_file = cache_file.with_name(cache_file.name + ".tmp")
+    with open(tmp_file, "w") as f:
+        json.dump(cache, f)
+    os.replace(tmp_file, cache_file)
+
+async def _resolve_record_types(hosts: List[str], resolvers: List[str], qtypes: List[int]) -> List[Dict[str, Tuple[List[str], int]]]:
+    # One record type at a time, so the configured concurrency is never exceeded
+    dns_config = CONFIG["dns"]
+    return [
+        await resolve_hosts(
+            hosts,
+            resolvers,
+            concurrency=dns_config["concurrency"],
+            timeout=dns_config["timeout"],
+            retries=dns_config["retries"],
+            qtype=qtype,
+        )
+        for qtype in qtypes
+    ]
+
+def resolve_with_cache(
+    hosts: Iterable[str],
+    resolvers: Optional[List[str]] = None,
+    cache_file: Path = HACKMATE_DNS_CACHE,
+    record_types: Optional[List[str]] = None,
+) -> Dict[str, List[str]]:
+    """
+    Resolves hosts to IPs, answering from the TTL-respecting cache where possible
+    and querying the resolvers (default: the configured ones) for the rest. The
+    record types (default: dns.record_types) are merged into one address list;
+    the cache is kept per resolver set and record types.
+
+    :return: {host: [ips]} for every host, with an empty list for unresolvable names.
+    """
+    dns_config = CONFIG["dns"]
+    resolvers = resolvers or dns_config["resolvers"]
+    record_types = [t.upper() for t in (record_types or dns_config["record_types"])]
+    unknown = [t for t in record_types if t not in RECORD_TYPES]
+    if unknown:
+        raise ValueError(f"Unsupported DNS record types: {', '.join(unknown)}. Use {', '.join(RECORD_TYPES)}.")
+    hosts = sorted({host.strip().lower().rstrip(".") for host in hosts if host.strip()})
+    cache = load_dns_cache(cache_file)
+    entries = cache.setdefault(_cache_key(resolvers, record_types), {})
+    missing = [host for host in hosts if host not in entries]
+
+    if missing:
+        console.print(f"[dim]Resolving {len(missing)} names ({len(hosts) - len(missing)} cached)...[/dim]")
+        answers = asyncio.run(_resolve_record_types(missing, resolvers, [RECORD_TYPES[t] for t in record_types]))
+        now = time.time()
+        for host in missing:
+            answered = [by_host[host] for by_host in answers if host in by_host]
+            # Hosts that timed out for every record type are retried next time
+            if answered:
+                addresses = [ip for ips, _ in answered for ip in ips]
+                entries[host] = {"ips": addresses, "expires": now + min(ttl for _, ttl in answered)}
+        try:
+            save_dns_cache(cache, cache_file)
+        except OSError as e:
+            console.print(f"[bold yellow]Warning:[/bold yellow] Could not write DNS cache: {e}")
+
+    return {host: entries[host]["ips"] if host in entries else [] for host in hosts}
+
+# --- Scan Collapsing ---
+
+def write_unique_ips(
+    host_map: Dict[str, List[str]],
+    workspace_path: Path,
+    version: Optional[int] = None,
+    filename: str = RESOLVED_IPS,
+) -> Tuple[Path, int]:
+    """Writes the unique IPs of a host map (optionally only IPv4 or IPv6) as a scanner input list (-iL)."""
+    ips = sorted({
+        ip for addresses in host_map.values() for ip in addresses
+        if version is None or (":" in ip) == (version == 6)
+    })
+    path = workspace_path / filename
+    with open(path, "w") as f:
+        f.write("\n".join(ips) + "\n" if ips else "")
+    return path, len(ips)
+
+def fan_out(ip_results: Dict[str, List[Dict]], host_map: Dict[str, List[str]]) -> Dict[str, List[Dict]]:
+    """Maps per-IP scan results back onto every hostname that resolved to that IP."""
+    host_results = {}
+    for host, addresses in host_map.items():
+        ports = []
+        for ip in addresses:
+            for result in ip_results.get(ip, []):
+                ports.append(dict(result, ip=ip))
+        if ports:
+            host_results[host] = ports
+    return host_results
@@ -1,22 +1,85 @@
 import click
-from rich.console import Console
+import xml.etree.ElementTree as ET
+from pathlib import Path
+from typing import Dict, List
 from .config import get_workspace_path, CONFIG
-from .utils import run_external_tool
-
-console = Console()
+from .utils import run_external_tool, save_json_artifact, load_json_artifact, record_artifact, console, error
+from .resolve import HOST_IP_MAP, RESOLVED_IPS, RESOLVED_IPS6, write_unique_ips, fan_out
+from .artifacts import find_artifact, open_artifact
+from .scope import load_scope, write_exclude_file, filter_artifact, report_filter, host_from_masscan_line
 
 @click.group()
 def scan():
     """Scanning and Enumeration commands."""
     pass
 
+def parse_nmap_xml(path: Path) -> Dict[str, List[Dict]]:
+    """Parses nmap XML output into {ip: [port results]}, streaming host by host."""
+    results = {}
+    with open_artifact(path, "rb") as f:
+        for _, element in ET.iterparse(f, events=("end",)):
+            if element.tag != "host":
+                continue
+            address = element.find("address[@addrtype='ipv4']")
+            if address is None:
+                address = element.find("address[@addrtype='ipv6']")
+            if address is not None:
+                ports = []
+                for port in element.iter("port"):
+                    state = port.find("state")
+                    service = port.find("service")
+                    ports.append({
+                        "port": int(port.get("portid")),
+                        "protocol": port.get("protocol"),
+                        "state": state.get("state") if state is not None else None,
+                        "service": service.get("name") if service is not None else None,
+                        "product": service.get("product") if service is not None else None,
+                    })
+                results[address.get("addr")] = ports
+            element.clear()
+    return results
+
+def parse_masscan_grepable(path: Path) -> Dict[str, List[Dict]]:
+    """Parses masscan -oG output into {ip: [port results]}."""
+    results = {}
+    with open_artifact(path) as f:
+        for line in f:
+            if "Host:" not in line or "Ports:" not in line:
+                continue
+            ip = line.split("Host:", 1)[1].split()[0]
+            for entry in line.split("Ports:", 1)[1].split(","):
+                fields = entry.strip().split("/")
+                if len(fields) < 3 or not fields[0].isdigit():
+                    continue
+                results.setdefault(ip, []).append({
+                    "port": int(fields[0]),
+                    "protocol": fields[2],
+                    "state": fields[1],
+                    "service": fields[4] if len(fields) > 4 and fields[4] else None,
+                })
+    return results
+
+def load_host_map(target: str, workspace: Path):
+    """Loads the host-to-IP map written by 'recon resolve' and writes its unique IPs for -iL."""
+    host_map = load_json_artifact(HOST_IP_MAP, workspace)
+    if not host_map:
+        error(f"{HOST_IP_MAP} not found. Run 'hackmate recon resolve {target}' first.")
+        return None, None
+    ips_file, count = write_unique_ips(host_map, workspace)
+    if not count:
+        error(f"No resolved IPs in {HOST_IP_MAP}.")
+        return None, None
+    console.print(f"[dim]Scanning {count} unique IPs for {len(host_map)} hostnames.[/dim]")
+    return host_map, ips_file
+
 @scan.command()
 @click.argument("target")
 @click.option("--ports", default="1-65535", help="Port range for masscan (e.g., 1-1000, 80,443).")
 @click.option("--rate", type=int, default=CONFIG["safe_defaults"]["masscan_rate"], help="Packet rate for masscan.")
+@click.option("--resolved", is_flag=True, help="Scan each unique IP from 'recon resolve' once and map results back to hostnames.")
 @click.option("--confirm-scope", is_flag=True, help="Explicitly confirm scope for the target.")
 @click.option("--execute", is_flag=True, help="Explicitly confirm execution of intrusive steps.")
-def masscan(target, ports, rate, confirm_scope, execute):
+def masscan(target, ports, rate, resolved, confirm_scope, execute):
     """
     Performs a fast masscan and saves the results.
     This is considered an intrusive step and requires --execute.
@@ -27,14 +90,26 @@ def masscan(target, ports, rate, confirm_scope, execute):
     tool_path = CONFIG["tools"]["masscan"]
     output_file = "masscan_raw.txt"
     
+    host_map = None
+    if resolved:
+        host_map, ips_file = load_host_map(target, workspace)
+        if host_map is None:
+            return
+
     args = [
-        target,
+        *(["-iL", str(ips_file)] if resolved else [target]),
         "-p", ports,
         "--rate", str(rate),
         "-oG", str(workspace / output_file), # Greppable output for simplicity
     ]
+
+    scope = load_scope(target, workspace)
+    exclude_file = write_exclude_file(scope, workspace)
+    if exclude_file:
+        args.extend(["--excludefile", str(exclude_file)])
     
-    run_external_tool(
+    # Output left over from an earlier run must not be filtered or fanned out again
+    if run_external_tool(
         tool_path=tool_path,
         args=args,
         target=target,
@@ -43,8 +118,20 @@ def masscan(target, ports, rate, confirm_scope, execute):
         check_scope=confirm_scope,
         is_intrusive=True,
         confirm_execute=execute,
-    )
+        scope_hosts=[host for host, ips in host_map.items() if ips] if host_map else None,
+    ) is None:
+        return
     
+    # Resolved IPs are in scope through their hostnames, which an IP-only filter cannot see
+    if host_map is not None:
+        scope = scope.with_resolved(host_map)
+    kept, dropped = filter_artifact(workspace / output_file, scope, host_from_masscan_line)
+    report_filter(output_file, kept, dropped)
+
+    if host_map is not None and find_artifact(workspace / output_file):
+        save_json_artifact(fan_out(parse_masscan_grepable(workspace / output_file), host_map), "masscan_hosts.json", workspace, target)
+
+    record_artifact(workspace / output_file, target)
     console.print(f"[bold green]Masscan complete.[/bold green] Results saved to {workspace / output_file}")
 
 @scan.command()
@@ -52,9 +139,10 @@ def masscan(target, ports, rate, confirm_scope, execute):
 @click.option("--ports", default="80,443,21,22,23,25,110,139,445,3389", help="Comma-separated list of ports for Nmap.")
 @click.option("--fast", is_flag=True, help="Use a faster Nmap profile (-T4 -F).")
 @click.option("--full", is_flag=True, help="Use a full Nmap profile (-sC -sV -O -A).")
+@click.option("--resolved", is_flag=True, help="Scan each unique IP from 'recon resolve' once and map results back to hostnames.")
 @click.option("--confirm-scope", is_flag=True, help="Explicitly confirm scope for the target.")
 @click.option("--execute", is_flag=True, help="Explicitly confirm execution of intrusive steps.")
-def nmap(target, ports, fast, full, confirm_scope, execute):
+def nmap(target, ports, fast, full, resolved, confirm_scope, execute):
     """
     Performs a targeted Nmap scan.
     This is considered an intrusive step and requires --execute.
@@ -65,11 +153,21 @@ def nmap(target, ports, fast, full, confirm_scope, execute):
     tool_path = CONFIG["tools"]["nmap"]
     output_file_base = "nmap_scan"
     
-    args = [
-        "-p", ports,
-        "-oA", str(workspace / output_file_base), # Output in all formats (XML, Nmap, Grepable)
-        target,
-    ]
+    host_map = None
+    if resolved:
+        host_map, _ = load_host_map(target, workspace)
+        if host_map is None:
+            return
+        # nmap only scans IPv6 addresses with -6, so each address family gets its own pass
+        passes = []
+        for version, ips_name, base in ((4, RESOLVED_IPS, output_file_base), (6, RESOLVED_IPS6, output_file_base + "6")):
+            ips_file, count = write_unique_ips(host_map, workspace, version, ips_name)
+            if count:
+                passes.append((version, base, ["-iL", str(ips_file)] + (["-6"] if version == 6 else [])))
+    else:
+        passes = [(None, output_file_base, [target])]
+
+    args = ["-p", ports]
     
     # Timing profile
     if fast:
@@ -80,18 +178,41 @@ def nmap(target, ports, fast, full, confirm_scope, execute):
         args.append(f"-T{CONFIG['safe_defaults']['nmap_timing'][-1]}") # e.g., -T3
         args.extend(["-sC", "-sV"]) # Default to script and version scan
 
-    run_external_tool(
-        tool_path=tool_path,
-        args=args,
-        target=target,
-        workspace_path=workspace,
-        output_filename=None, # Nmap writes directly to file via -oA
-        check_scope=confirm_scope,
-        is_intrusive=True,
-        confirm_execute=execute,
-    )
-    
-    console.print(f"[bold green]Nmap scan complete.[/bold green] Results saved to {workspace / output_file_base}.*")
+    scope = load_scope(target, workspace)
+    completed = []
+    for version, base, target_args in passes:
+        pass_args = args + ["-oA", str(workspace / base)] + target_args # Output in all formats (XML, Nmap, Grepable)
+        exclude_file = write_exclude_file(scope, workspace, f"scope_exclude{version or ''}.txt", version)
+        if exclude_file:
+            pass_args.extend(["--excludefile", str(exclude_file)])
+
+        # Output left over from an earlier run must not be fanned out over a newer host map
+        if run_external_tool(
+            tool_path=tool_path,
+            args=pass_args,
+            target=target,
+            workspace_path=workspace,
+            output_filename=None, # Nmap writes directly to file via -oA
+            check_scope=confirm_scope,
+            is_intrusive=True,
+            confirm_execute=execute,
+            scope_hosts=[host for host, ips in host_map.items() if ips] if host_map else None,
+        ) is not None:
+            completed.append(base)
+    if not completed:
+        return
+
+    if host_map is not None:
+        ip_results = {}
+        for base in completed:
+            if find_artifact(workspace / f"{base}.xml"):
+                ip_results.update(parse_nmap_xml(workspace / f"{base}.xml"))
+        save_json_artifact(fan_out(ip_results, host_map), "nmap_hosts.json", workspace, target)
+
+    for base in completed:
+        for extension in ("xml", "nmap", "gnmap"):
+            record_artifact(workspace / f"{base}.{extension}", target)
+    console.print(f"[bold green]Nmap scan complete.[/bold green] Results saved to {', '.join(str(workspace / base) + '.*' for base in completed)}")
 
 if __name__ == '__main__':
     scan()
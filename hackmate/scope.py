@@ -0,0 +1,395 @@
+import bisect
+import ipaddress
+import os
+import shutil
+import socket
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+import click
+
+from .config import get_workspace_path, sanitize_target, CONFIG, HACKMATE_GLOBAL_SCOPE
+from .events import console, emit, error
+from .artifacts import discard_compressed, ensure_plain
+
+SCOPE_FILENAME = "scope.txt"
+
+# A scope file has one rule per line; '#' starts a comment and '!' marks an exclusion.
+#
+#   example.com            exact host
+#   *.example.com          any subdomain of example.com (not the apex)
+#   10.0.0.0/24            CIDR (IPv4 or IPv6)
+#   10.0.1.5-10.0.1.20     inclusive IP range
+#   !admin.example.com     exclusion, wins over an include of equal or lower specificity
+#   !10.0.0.13
+
+_EXACT = "="
+_WILDCARD = "*"
+
+def normalize_host(value: str) -> str:
+    """Reduces a URL, host:port or bare host to the lower-cased host part."""
+    host = value.strip().lower()
+    if "://" in host:
+        host = host.split("://", 1)[1].split("/", 1)[0]
+        if "@" in host:
+            host = host.rsplit("@", 1)[1]
+    if host.startswith("["):
+        return host[1:].split("]", 1)[0]
+    if host.count(":") == 1:
+        host = host.split(":", 1)[0]
+    return host.rstrip(".")
+
+def _parse_ip_range(value: str) -> Optional[Tuple[int, int, int]]:
+    """Parses an IP, CIDR or 'start-end' range into (version, start, end), or None for hostnames."""
+    # Fast path for single addresses, which is what bulk filtering mostly sees
+    for family, version in ((socket.AF_INET, 4), (socket.AF_INET6, 6)):
+        try:
+            address = int.from_bytes(socket.inet_pton(family, value), "big")
+            return version, address, address
+        except OSError:
+            continue
+    if "-" in value:
+        start, _, end = value.partition("-")
+        try:
+            first = ipaddress.ip_address(start.strip())
+            last = ipaddress.ip_address(end.strip())
+        except ValueError:
+            return None
+        if first.version != last.version or int(first) > int(last):
+            raise ValueError(f"Invalid IP range: {value}")
+        return first.version, int(first), int(last)
+    try:
+        network = ipaddress.ip_network(value, strict=False)
+    except ValueError:
+        return None
+    return network.version, int(network.network_address), int(network.broadcast_address)
+
+def _merge(intervals: List[Tuple[int, int]]) -> Tuple[List[int], List[int]]:
+    """Merges overlapping and adjacent intervals into parallel start/end lists for bisect lookups."""
+    starts, ends = [], []
+    for start, end in sorted(intervals):
+        if ends and start <= ends[-1] + 1:
+            ends[-1] = max(ends[-1], end)
+        else:
+            starts.append(start)
+            ends.append(end)
+    return starts, ends
+
+def _covers(index: Tuple[List[int], List[int]], start: int, end: int) -> bool:
+    """True if a single merged interval covers the whole [start, end] range."""
+    starts, ends = index
+    i = bisect.bisect_right(starts, start) - 1
+    return i >= 0 and ends[i] >= end
+
+class Scope:
+    """
+    A compiled set of scope rules. IP rules are merged into sorted interval lists
+    searched with bisect; domain rules live in a trie keyed by reversed labels, so
+    each lookup costs O(log n) for IPs and O(labels) for hostnames.
+    """
+
+    def __init__(self, rules: Iterable[str], source: Optional[Path] = None):
+        self.source = source
+        self.rules: List[str] = []
+        self._trie: Dict[str, dict] = {}
+        ip_include = {4: [], 6: []}
+        ip_exclude = {4: [], 6: []}
+
+        for line in rules:
+            rule = line.split("#", 1)[0].strip().lower()
+            if not rule:
+                continue
+            self.rules.append(rule)
+            excluded = rule.startswith("!")
+            value = rule.lstrip("!").strip()
+
+            ip_range = _parse_ip_range(value)
+            if ip_range is not None:
+                version, start, end = ip_range
+                (ip_exclude if excluded else ip_include)[version].append((start, end))
+                continue
+
+            key = _EXACT
+            if value.startswith("*."):
+                key = _WILDCARD
+                value = value[2:]
+            node = self._trie
+            for label in reversed(value.rstrip(".").split(".")):
+                node = node.setdefault(label, {})
+            # An exclusion is never overridden by an include for the same pattern.
+            node[key] = False if excluded else node.get(key, True)
+
+        self._include = {version: _merge(intervals) for version, intervals in ip_include.items()}
+        self._exclude = {version: _merge(intervals) for version, intervals in ip_exclude.items()}
+
+    @classmethod
+    def from_file(cls, path: Path) -> "Scope":
+        with open(path, "r") as f:
+            return cls(f, source=path)
+
+    @classmethod
+    def implicit(cls, target: str) -> "Scope":
+        """The scope assumed when a workspace has no scope file: the target and its subdomains."""
+        host = normalize_host(target)
+        if _parse_ip_range(host) is not None:
+            return cls([host])
+        return cls([host, f"*.{host}"])
+
+    def with_resolved(self, host_map: Dict[str, List[str]]) -> "Scope":
+        """
+        Returns a copy of the scope that also covers the IPs of in-scope hostnames,
+        so per-IP scan output of resolved hosts survives filtering. IP exclusions still win.
+        """
+        ips = {ip for host, addresses in host_map.items() if self.contains(host) for ip in addresses}
+        return Scope(self.rules + sorted(ips), source=self.source)
+
+    def _ip_in_scope(self, version: int, start: int, end: int) -> bool:
+        if _covers(self._exclude[version], start, end):
+            return False
+        return _covers(self._include[version], start, end)
+
+    def _domain_in_scope(self, host: str) -> bool:
+        labels = host.split(".")
+        node = self._trie
+        verdict = False
+        for depth, label in enumerate(reversed(labels), start=1):
+            node = node.get(label)
+            if node is None:
+                return verdict
+            if depth < len(labels) and _WILDCARD in node:
+                verdict = node[_WILDCARD]
+        return node.get(_EXACT, verdict)
+
+    def contains(self, value: str) -> bool:
+        """
+        Checks a host, IP, URL, CIDR or IP range against the scope. Networks are in
+        scope when fully covered by includes; callers scanning them should pass
+        write_exclude_file() to the scanner to skip partially excluded addresses.
+        """
+        host = normalize_host(value)
+        if not host:
+            return False
+        if host[0].isdigit() or ":" in host:
+            try:
+                ip_range = _parse_ip_range(host)
+            except ValueError:
+                return False
+            if ip_range is not None:
+                return self._ip_in_scope(*ip_range)
+        return self._domain_in_scope(host)
+
+    def excludes_ip(self, value: str) -> bool:
+        """True if an IP address is explicitly excluded by a '!' rule."""
+        try:
+            ip_range = _parse_ip_range(normalize_host(value))
+        except ValueError:
+            return False
+        return ip_range is not None and _covers(self._exclude[ip_range[0]], ip_range[1], ip_range[2])
+
+    def overlaps_domain(self, domain: str) -> bool:
+        """True if the domain or any of its subdomains is in scope, e.g. for passive enumeration."""
+        if self.contains(domain):
+            return True
+        node = self._trie
+        for label in reversed(normalize_host(domain).split(".")):
+            node = node.get(label)
+            if node is None:
+                return False
+            if node.get(_WILDCARD):
+                return True
+        stack = [node]
+        while stack:
+            node = stack.pop()
+            for key, child in node.items():
+                if isinstance(child, dict):
+                    stack.append(child)
+                elif child:
+                    return True
+        return False
+
+    def excluded_ip_ranges(self) -> List[str]:
+        """Lists the excluded IP ranges in 'start-end' form, as accepted by nmap and masscan."""
+        ranges = []
+        for version, (starts, ends) in self._exclude.items():
+            for start, end in zip(starts, ends):
+                address_type = ipaddress.IPv4Address if version == 4 else ipaddress.IPv6Address
+                first, last = address_type(start), address_type(end)
+                ranges.append(str(first) if start == end else f"{first}-{last}")
+        return ranges
+
+# Invalid scope files already reported in this process
+_invalid_reported = set()
+
+def find_scope_file(target: str, workspace_path: Path) -> Optional[Path]:
+    """
+    Finds the scope file that governs a target: its own workspace's, else the one
+    of the nearest parent domain's workspace (admin.example.com -> example.com),
+    else the global HACKMATE_GLOBAL_SCOPE. Returns None if none exists.
+    """
+    candidates = [workspace_path / SCOPE_FILENAME]
+    host = normalize_host(target)
+    if host and _parse_ip_range(host) is None:
+        workspace_root = Path(CONFIG["workspace_dir"])
+        labels = host.split(".")
+        for i in range(1, len(labels) - 1):
+            candidates.append(workspace_root / sanitize_target(".".join(labels[i:])) / SCOPE_FILENAME)
+    candidates.append(HACKMATE_GLOBAL_SCOPE)
+    for candidate in candidates:
+        if candidate.is_file():
+            return candidate
+    return None
+
+def load_scope(target: str, workspace_path: Path) -> Scope:
+    """
+    Loads the scope file that governs the target (see find_scope_file), falling
+    back to the implicit scope of the target. An implicit scope has source None;
+    intrusive tools refuse to run under it. An invalid scope file yields an
+    empty scope, so every target is refused.
+    """
+    scope_file = find_scope_file(target, workspace_path)
+    if scope_file is None:
+        return Scope.implicit(target)
+    try:
+        return Scope.from_file(scope_file)
+    except ValueError as e:
+        # A broken scope file must never widen the scope: nothing is in scope until it is fixed
+        if scope_file not in _invalid_reported:
+            _invalid_reported.add(scope_file)
+            error(f"Invalid scope file {scope_file}: {e}. Refusing all targets until it is fixed.", "Safety Error:")
+        return Scope([], source=scope_file)
+
+def write_exclude_file(scope: Scope, workspace_path: Path, filename: str = "scope_exclude.txt", version: Optional[int] = None) -> Optional[Path]:
+    """
+    Writes the scope's IP exclusions (optionally only IPv4 or IPv6) for --excludefile,
+    or returns None if there are none.
+    """
+    ranges = [r for r in scope.excluded_ip_ranges() if version is None or (":" in r) == (version == 6)]
+    if not ranges:
+        return None
+    path = workspace_path / filename
+    with open(path, "w") as f:
+        f.write("\n".join(ranges) + "\n")
+    return path
+
+# --- Output Filters ---
+
+def host_from_line(line: str) -> Optional[str]:
+    """Host extractor for one-host-per-line output (subfinder)."""
+    return line.strip() or None
+
+def host_from_httpx_line(line: str) -> Optional[str]:
+    """Host extractor for httpx output ('https://host [200] [title] ...')."""
+    parts = line.split(None, 1)
+    return parts[0] if parts else None
+
+def host_from_masscan_line(line: str) -> Optional[str]:
+    """Host extractor for masscan -oG output; comment lines are always kept."""
+    if "Host:" not in line:
+        return None
+    return line.split("Host:", 1)[1].split()[0]
+
+def filter_artifact(
+    path: Path,
+    scope: Scope,
+    extract_host: Callable[[str], Optional[str]] = host_from_line,
+) -> Tuple[int, int]:
+    """
+    Rewrites a line-based tool output in place, keeping only in-scope hosts.
+    Dropped lines are appended to '<name>_out_of_scope.txt' for auditing.
+    Lines for which extract_host returns None are kept unchanged.
+
+    :return: A (kept, dropped) tuple of line counts.
+    """
+    if not path.exists():
+        return 0, 0
+
+    kept = dropped = 0
+    tmp_path = path.with_name(path.name + ".tmp")
+    rejected_path = ensure_plain(path.with_name(f"{path.stem}_out_of_scope.txt"))
+    with open(path, "r") as src, open(tmp_path, "w") as dst, open(rejected_path, "a") as rejected:
+        for line in src:
+            host = extract_host(line)
+            if host is None or scope.contains(host):
+                if host is not None:
+                    kept += 1
+                dst.write(line)
+            else:
+                dropped += 1
+                rejected.write(line)
+    os.replace(tmp_path, path)
+    discard_compressed(path)
+    if rejected_path.stat().st_size == 0:
+        rejected_path.unlink()
+    return kept, dropped
+
+def report_filter(name: str, kept: int, dropped: int):
+    """Prints the outcome of a scope filter pass."""
+    emit("result", kind="scope_filter", data={"file": name, "kept": kept, "dropped": dropped})
+    if dropped:
+        console.print(f"[bold yellow]Scope Filter:[/bold yellow] Dropped {dropped} out-of-scope entries from {name} ({kept} kept).")
+    else:
+        console.print(f"[dim]Scope Filter: all {kept} entries in {name} are in scope.[/dim]")
+
+# --- CLI ---
+
+@click.group()
+def scope():
+    """Manage the scope rules for targets."""
+    pass
+
+@scope.command("set")
+@click.argument("target")
+@click.argument("scope_file", type=click.Path(exists=True, dir_okay=False))
+def set_scope(target, scope_file):
+    """Installs a scope file into the target's workspace."""
+    workspace = get_workspace_path(target)
+    try:
+        compiled = Scope.from_file(Path(scope_file))
+    except ValueError as e:
+        error(f"Invalid scope file: {e}")
+        return
+    shutil.copyfile(scope_file, workspace / SCOPE_FILENAME)
+    console.print(f"[bold green]Scope set for {target}[/bold green] with {len(compiled.rules)} rules.")
+
+@scope.command()
+@click.argument("target")
+def show(target):
+    """Shows the scope rules in effect for a target."""
+    workspace = get_workspace_path(target)
+    compiled = load_scope(target, workspace)
+    if compiled.source is None:
+        console.print(f"[bold yellow]No scope file for {target}.[/bold yellow] Using the implicit scope:")
+    else:
+        console.print(f"[bold cyan]Scope file:[/bold cyan] {compiled.source}")
+    for rule in compiled.rules:
+        style = "red" if rule.startswith("!") else "green"
+        console.print(f"  [{style}]{rule}[/{style}]")
+
+@scope.command()
+@click.argument("target")
+@click.argument("hosts", nargs=-1)
+@click.option("-f", "--file", "hosts_file", type=click.Path(exists=True, dir_okay=False), help="File with one host, IP or URL per line.")
+def check(target, hosts, hosts_file):
+    """Checks hosts against the target's scope."""
+    compiled = load_scope(target, get_workspace_path(target))
+    if hosts_file:
+        in_scope = out_of_scope = 0
+        with open(hosts_file, "r") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                if compiled.contains(line):
+                    in_scope += 1
+                else:
+                    out_of_scope += 1
+        emit("result", kind="scope_check_file", data={"file": hosts_file, "in_scope": in_scope, "out_of_scope": out_of_scope})
+        console.print(f"[bold green]In scope:[/bold green] {in_scope}  [bold red]Out of scope:[/bold red] {out_of_scope}")
+    for host in hosts:
+        emit("result", kind="scope_check", data={"host": host, "in_scope": compiled.contains(host)})
+        if compiled.contains(host):
+            console.print(f"[bold green]IN[/bold green]  {host}")
+        else:
+            console.print(f"[bold red]OUT[/bold red] {host}")
+
+if __name__ == '__main__':
+    scope()
@@ -1,10 +1,11 @@
 import subprocess
 import json
+import time
 from pathlib import Path
 from typing import List, Optional, Dict, Any
-from rich.console import Console
-
-console = Console()
+from .events import console, emit, error, jsonl_enabled
+from .scope import load_scope
+from .artifacts import find_artifact, open_artifact, discard_compressed
 
 def run_external_tool(
     tool_path: str,
@@ -16,6 +17,7 @@ def run_external_tool(
     check_scope: bool = False,
     is_intrusive: bool = False,
     confirm_execute: bool = False,
+    scope_hosts: Optional[List[str]] = None,
 ) -> Optional[str]:
     """
     Runs an external tool and handles logging and output.
@@ -26,26 +28,41 @@ def run_external_tool(
     :param workspace_path: The target's workspace directory.
     :param output_filename: If provided, stdout is saved to this file in the workspace.
     :param timeout: Timeout for the command in seconds.
-    :param check_scope: If True, requires scope confirmation.
+    :param check_scope: If True, refuses to run unless the target is in the workspace scope.
     :param is_intrusive: If True, requires --execute flag.
     :param confirm_execute: The value of the --execute flag passed by the user.
-    :return: The stdout of the command if no output_filename is provided, otherwise None.
+    :param scope_hosts: Hosts actually scanned (e.g. from an -iL list), checked against the scope instead of target.
+    :return: The stdout of the command ('' if it was saved to output_filename), or None
+             if the tool was refused or did not complete successfully.
     """
     
     full_command = [tool_path] + args
     
     # 1. Safety Checks
-    if check_scope:
-        console.print(f"[bold yellow]Safety Check:[/bold yellow] This operation requires explicit scope confirmation for target [bold cyan]{target}[/bold cyan].")
-        # In a real CLI, this would prompt the user or check a scope file.
-        # For this implementation, we'll assume the user has confirmed the scope if the command is run.
-        # A more robust implementation would be needed for production.
-
     if is_intrusive and not confirm_execute:
-        console.print(f"[bold red]Safety Error:[/bold red] The command '[bold]{tool_path}[/bold]' is intrusive and requires the [bold]--execute[/bold] flag to run.")
+        error(f"The command '[bold]{tool_path}[/bold]' is intrusive and requires the [bold]--execute[/bold] flag to run.", "Safety Error:")
         return None
 
+    # Intrusive tools are always checked against the scope, even without --confirm-scope.
+    if check_scope or is_intrusive:
+        scope = load_scope(target, workspace_path)
+        # A target must not approve itself: intrusive tools need a scope file that applies to it.
+        if is_intrusive and scope.source is None:
+            error(f"No scope file applies to [bold cyan]{target}[/bold cyan]. Intrusive tools require one; define it with 'hackmate scope set <target> <file>'.", "Safety Error:")
+            return None
+        out_of_scope = [host for host in (scope_hosts or [target]) if not scope.contains(host)]
+        if out_of_scope:
+            source = scope.source or "the implicit target scope"
+            error(f"Target [bold cyan]{out_of_scope[0]}[/bold cyan] is out of scope according to {source}.", "Safety Error:")
+            return None
+
     console.print(f"[bold green]Running:[/bold green] {' '.join(full_command)}")
+    emit("tool_start", tool=tool_path, args=args, target=target)
+    started = time.monotonic()
+
+    def tool_end(status: str, returncode: Optional[int] = None):
+        emit("tool_end", tool=tool_path, target=target, status=status, returncode=returncode,
+             duration_ms=round((time.monotonic() - started) * 1000))
 
     try:
         # Determine where to redirect stdout
@@ -58,50 +75,65 @@ def run_external_tool(
         process = subprocess.run(
             full_command,
             capture_output=True if not output_filename else False,
+            # Tool output must not interleave with the JSONL event stream
+            stdout=subprocess.DEVNULL if output_filename and jsonl_enabled() else None,
             text=True,
             timeout=timeout,
             check=True, # Raise CalledProcessError on non-zero exit code
             encoding="utf-8",
         )
 
+        tool_end("ok", process.returncode)
         if output_filename:
             stdout_dest.close()
-            return None
+            emit("artifact_written", path=str(output_path), target=target)
+            return ""
         else:
             return process.stdout.strip()
 
     except subprocess.CalledProcessError as e:
-        console.print(f"[bold red]Error:[/bold red] Tool '{tool_path}' failed with exit code {e.returncode}.")
-        console.print(f"[dim]Stderr:[/dim] {e.stderr.strip()}")
+        tool_end("failed", e.returncode)
+        error(f"Tool '{tool_path}' failed with exit code {e.returncode}.")
+        console.print(f"[dim]Stderr:[/dim] {(e.stderr or '').strip()}")
         return None
     except FileNotFoundError:
-        console.print(f"[bold red]Error:[/bold red] Tool '{tool_path}' not found. Check your PATH or configure the tool path in [bold]~/.hackmate/config.yaml[/bold].")
+        tool_end("not_found")
+        error(f"Tool '{tool_path}' not found. Check your PATH or configure the tool path in [bold]~/.hackmate/config.yaml[/bold].")
         return None
     except subprocess.TimeoutExpired:
-        console.print(f"[bold red]Error:[/bold red] Tool '{tool_path}' timed out after {timeout} seconds.")
+        tool_end("timeout")
+        error(f"Tool '{tool_path}' timed out after {timeout} seconds.")
         return None
     except Exception as e:
-        console.print(f"[bold red]An unexpected error occurred:[/bold red] {e}")
+        tool_end("error")
+        error(str(e), "An unexpected error occurred:")
         return None
 
-def save_json_artifact(data: Dict[str, Any], filename: str, workspace_path: Path):
+def record_artifact(path: Path, target: Optional[str] = None):
+    """Emits an artifact_written event for a file written by a tool itself (e.g. via -o)."""
+    if path.exists():
+        emit("artifact_written", path=str(path), target=target)
+
+def save_json_artifact(data: Dict[str, Any], filename: str, workspace_path: Path, target: Optional[str] = None):
     """Saves a dictionary as a JSON artifact in the workspace."""
     filepath = workspace_path / filename
     try:
         with open(filepath, "w") as f:
             json.dump(data, f, indent=4)
+        discard_compressed(filepath)
+        emit("artifact_written", path=str(filepath), target=target)
         console.print(f"[bold blue]Artifact Saved:[/bold blue] {filename} at {filepath}")
     except Exception as e:
-        console.print(f"[bold red]Error saving JSON artifact {filename}:[/bold red] {e}")
+        error(str(e), f"Error saving JSON artifact {filename}:")
 
 def load_json_artifact(filename: str, workspace_path: Path) -> Optional[Dict[str, Any]]:
-    """Loads a JSON artifact from the workspace."""
+    """Loads a JSON artifact from the workspace, decompressing it if it has been compressed."""
     filepath = workspace_path / filename
-    if not filepath.exists():
+    if find_artifact(filepath) is None:
         return None
     try:
-        with open(filepath, "r") as f:
+        with open_artifact(filepath) as f:
             return json.load(f)
     except Exception as e:
-        console.print(f"[bold red]Error loading JSON artifact {filename}:[/bold red] {e}")
+        error(str(e), f"Error loading JSON artifact {filename}:")
         return None
@@ -1,9 +1,15 @@
 import click
-from rich.console import Console
+import itertools
+import json
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Any, Iterator, List, Optional
 from .config import get_workspace_path, CONFIG
-from .utils import run_external_tool
-
-console = Console()
+from .utils import run_external_tool, record_artifact, console, error
+from .events import emit
+from .artifacts import find_artifact, open_artifact, discard_compressed
+from .scope import load_scope, host_from_httpx_line
+from .notes_report import add_findings
 
 @click.group()
 def web():
@@ -42,7 +48,7 @@ def test(url, wordlist, dirs, cms, confirm_scope, execute):
             "-v", # Verbose output to see progress
         ]
         
-        run_external_tool(
+        result = run_external_tool(
             tool_path=tool_path,
             args=args,
             target=target,
@@ -52,7 +58,9 @@ def test(url, wordlist, dirs, cms, confirm_scope, execute):
             is_intrusive=True,
             confirm_execute=execute,
         )
-        console.print(f"[bold green]Directory brute forcing complete.[/bold green] Results saved to {workspace / output_file}")
+        if result is not None:
+            record_artifact(workspace / output_file, target)
+            console.print(f"[bold green]Directory brute forcing complete.[/bold green] Results saved to {workspace / output_file}")
 
     if cms:
         console.print("[bold yellow]Running CMS and technology fingerprinting (whatweb/wpscan)...[/bold yellow]")
@@ -79,5 +87,190 @@ def test(url, wordlist, dirs, cms, confirm_scope, execute):
         )
         console.print(f"[bold green]CMS fingerprinting complete.[/bold green] Results saved to {workspace / output_file}")
 
+def stream_live_hosts(target: str, workspace: Path) -> Iterator[str]:
+    """Yields unique, in-scope URLs from the httpx output without loading it all at once."""
+    scope = load_scope(target, workspace)
+    seen = set()
+    with open_artifact(workspace / "live_hosts_raw.txt") as f:
+        for line in f:
+            host = host_from_httpx_line(line)
+            if host and host not in seen and scope.contains(host):
+                seen.add(host)
+                yield host
+
+def _parse_nuclei_result(line: str) -> Optional[Dict[str, Any]]:
+    try:
+        result = json.loads(line)
+    except ValueError:
+        return None
+    info = result.get("info", {})
+    severity = info.get("severity", "unknown")
+    matched_at = result.get("matched-at") or result.get("host", "")
+    return {
+        "tag": f"nuclei-{severity}",
+        "body": f"{info.get('name', result.get('template-id'))} [{result.get('template-id')}] at {matched_at}",
+        "severity": severity,
+        "source": "nuclei",
+        "template_id": result.get("template-id"),
+        "matched_at": matched_at,
+        "key": f"nuclei:{result.get('template-id')}:{matched_at}",
+    }
+
+def run_nuclei(
+    target: str,
+    severities: List[str],
+    tags: List[str],
+    templates: Optional[str],
+    workers: int,
+    rate_limit: int,
+    hosts_per_batch: int,
+    confirm_scope: bool,
+    execute: bool,
+) -> Optional[Dict[str, int]]:
+    """
+    Runs nuclei over the target's live hosts. Hosts are split into batches, each
+    batch is run once per severity, and the runs share a bounded worker pool whose
+    per-process rate limits add up to the global rate_limit. Results are merged
+    into nuclei_results.jsonl and ingested as findings.
+
+    :return: {"hosts", "runs", "results", "added"} counts, or None if nothing ran.
+    """
+    workspace = get_workspace_path(target)
+    if find_artifact(workspace / "live_hosts_raw.txt") is None:
+        error(f"live_hosts_raw.txt not found. Run 'hackmate recon probe {target}' first.")
+        return None
+    if not execute:
+        error("nuclei is intrusive and requires the [bold]--execute[/bold] flag to run.", "Safety Error:")
+        return None
+
+    tool_path = CONFIG["tools"]["nuclei"]
+    if rate_limit < 1:
+        error("--rate-limit must be at least 1 request per second.")
+        return None
+    if hosts_per_batch < 1:
+        error("--hosts-per-batch must be at least 1.")
+        return None
+    # Every process needs at least 1 req/s, so more workers than rate_limit would exceed the cap
+    if workers > rate_limit:
+        console.print(f"[bold yellow]Warning:[/bold yellow] Reducing workers from {workers} to {rate_limit} to stay within the {rate_limit} req/s rate limit.")
+    workers = max(1, min(workers, rate_limit))
+    per_run_rate = rate_limit // workers
+    timeout = CONFIG["nuclei"]["timeout"]
+
+    def run_batch(batch_id: int, hosts: List[str], hosts_file: Path, severity: str) -> Optional[Path]:
+        output_path = workspace / f"nuclei_{severity}_{batch_id:04d}.jsonl"
+        args = [
+            "-l", str(hosts_file),
+            "-severity", severity,
+            "-rate-limit", str(per_run_rate),
+            "-jsonl",
+            "-o", str(output_path),
+            "-silent",
+        ]
+        if tags:
+            args.extend(["-tags", ",".join(tags)])
+        if templates:
+            args.extend(["-t", templates])
+        result = run_external_tool(
+            tool_path=tool_path,
+            args=args,
+            target=target,
+            workspace_path=workspace,
+            output_filename=None, # nuclei writes directly to file via -o
+            timeout=timeout,
+            check_scope=confirm_scope,
+            is_intrusive=True,
+            confirm_execute=execute,
+            scope_hosts=hosts,
+        )
+        if result is None:
+            output_path.unlink(missing_ok=True)
+            return None
+        return output_path
+
+    host_count = 0
+    futures = []
+    hosts_files = []
+    hosts = stream_live_hosts(target, workspace)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for batch_id in itertools.count():
+            batch = list(itertools.islice(hosts, hosts_per_batch))
+            if not batch:
+                break
+            host_count += len(batch)
+            hosts_file = workspace / f"nuclei_hosts_{batch_id:04d}.txt"
+            with open(hosts_file, "w") as f:
+                f.write("\n".join(batch) + "\n")
+            hosts_files.append(hosts_file)
+            for severity in severities:
+                futures.append(pool.submit(run_batch, batch_id, batch, hosts_file, severity))
+
+    if not futures:
+        console.print(f"[bold yellow]No in-scope live hosts for {target}.[/bold yellow]")
+        return None
+
+    output_paths = [future.result() for future in futures]
+    for hosts_file in hosts_files:
+        hosts_file.unlink()
+    # Keep the previous results when no run completed rather than replacing them with nothing
+    if all(output_path is None for output_path in output_paths):
+        error(f"No nuclei run completed for {target}; nuclei_results.jsonl was left unchanged.")
+        return None
+
+    findings = []
+    merged_path = workspace / "nuclei_results.jsonl"
+    with open(merged_path, "w") as merged:
+        for output_path in output_paths:
+            if output_path is None or not output_path.exists():
+                continue
+            with open(output_path, "r") as f:
+                for line in f:
+                    finding = _parse_nuclei_result(line)
+                    if finding is not None:
+                        merged.write(line.rstrip("\n") + "\n")
+                        findings.append(finding)
+            output_path.unlink()
+    discard_compressed(merged_path)
+    record_artifact(merged_path, target)
+
+    added = add_findings(target, findings)
+    return {"hosts": host_count, "runs": len(futures), "results": len(findings), "added": added}
+
+@web.command()
+@click.argument("target")
+@click.option("--severity", help="Comma-separated severities, each run as its own template batch (default: nuclei.severities).")
+@click.option("--tags", help="Comma-separated template tags to include.")
+@click.option("-t", "--templates", help="Template file or directory passed to nuclei.")
+@click.option("--workers", type=int, default=CONFIG["nuclei"]["workers"], show_default=True, help="Number of concurrent nuclei processes.")
+@click.option("--rate-limit", type=int, default=CONFIG["nuclei"]["rate_limit"], show_default=True, help="Global request rate cap (requests/second) shared by all workers.")
+@click.option("--hosts-per-batch", type=int, default=CONFIG["nuclei"]["hosts_per_batch"], show_default=True, help="Number of hosts handed to each nuclei process.")
+@click.option("--confirm-scope", is_flag=True, help="Explicitly confirm scope for the target.")
+@click.option("--execute", is_flag=True, help="Explicitly confirm execution of intrusive steps.")
+def nuclei(target, severity, tags, templates, workers, rate_limit, hosts_per_batch, confirm_scope, execute):
+    """
+    Runs nuclei against the live hosts found by 'recon probe' and records the results as findings.
+    This is considered an intrusive step and requires --execute.
+    """
+    console.print(f"[bold]Starting nuclei scan for {target}...[/bold]")
+    severities = severity.split(",") if severity else CONFIG["nuclei"]["severities"]
+    stats = run_nuclei(
+        target,
+        severities=[s.strip() for s in severities if s.strip()],
+        tags=[t.strip() for t in tags.split(",") if t.strip()] if tags else [],
+        templates=templates,
+        workers=workers,
+        rate_limit=rate_limit,
+        hosts_per_batch=hosts_per_batch,
+        confirm_scope=confirm_scope,
+        execute=execute,
+    )
+    if stats is None:
+        return
+    emit("result", kind="nuclei", data=dict(stats, target=target))
+    console.print(
+        f"[bold green]Nuclei scan complete.[/bold green] {stats['hosts']} hosts, {stats['runs']} runs, "
+        f"{stats['results']} results ({stats['added']} new findings). Results saved to {get_workspace_path(target) / 'nuclei_results.jsonl'}"
+    )
+
 if __name__ == '__main__':
     web()
@@ -0,0 +1,199 @@
+import fnmatch
+import os
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, Iterator, List, Tuple
+
+import click
+from rich.table import Table
+
+from .artifacts import COMPRESSED_SUFFIXES, compress_file, original_name, resolve_codec
+from .config import CONFIG, HACKMATE_COMPACTION_STAMP
+from .utils import console, error
+from .events import emit
+
+# How often a command may kick off background compression of cold artifacts
+COMPACTION_INTERVAL = 3600
+
+def _human_size(size: float) -> str:
+    for unit in ("B", "KB", "MB", "GB"):
+        if abs(size) < 1024:
+            return f"{size:.1f} {unit}" if unit != "B" else f"{int(size)} B"
+        size /= 1024
+    return f"{size:.1f} TB"
+
+def _is_raw(name: str, patterns: List[str]) -> bool:
+    name = original_name(name)
+    return any(fnmatch.fnmatch(name, pattern) for pattern in patterns)
+
+def iter_workspace_files(workspace_root: Path) -> Iterator[Tuple[str, os.DirEntry]]:
+    """Yields (workspace name, file entry) for every file directly inside a workspace."""
+    try:
+        workspaces = list(os.scandir(workspace_root))
+    except FileNotFoundError:
+        return
+    for workspace in workspaces:
+        if not workspace.is_dir():
+            continue
+        with os.scandir(workspace.path) as entries:
+            for entry in entries:
+                if entry.is_file() and not entry.name.endswith(".tmp"):
+                    yield workspace.name, entry
+
+def compress_cold_artifacts(workspace_root: Path, dry_run: bool = False) -> Dict[str, Dict[str, int]]:
+    """
+    Compresses raw artifacts that have not been modified for 'compress_after_hours'.
+
+    :return: {workspace: {"files": n, "before": bytes, "after": bytes}}.
+    """
+    retention = CONFIG["retention"]
+    cutoff = time.time() - retention["compress_after_hours"] * 3600
+    min_size = retention["compress_min_kb"] * 1024
+    codec = resolve_codec(retention["codec"])
+    stats = defaultdict(lambda: {"files": 0, "before": 0, "after": 0})
+
+    candidates = []
+    for workspace, entry in iter_workspace_files(workspace_root):
+        if entry.name.endswith(COMPRESSED_SUFFIXES) or not _is_raw(entry.name, retention["raw_patterns"]):
+            continue
+        stat = entry.stat()
+        if stat.st_mtime < cutoff and stat.st_size >= min_size:
+            candidates.append((workspace, Path(entry.path), stat.st_size))
+
+    for workspace, path, size in candidates:
+        if dry_run:
+            stats[workspace]["files"] += 1
+            stats[workspace]["before"] += size
+            stats[workspace]["after"] += size
+            continue
+        try:
+            compressed = compress_file(path, codec)
+        except OSError as e:
+            error(str(e), f"Error compressing {path}:")
+            continue
+        if compressed is not None:
+            stats[workspace]["files"] += 1
+            stats[workspace]["before"] += size
+            stats[workspace]["after"] += compressed.stat().st_size
+    return stats
+
+def apply_retention(workspace_root: Path, max_age_days: float, max_size_mb: float, dry_run: bool = False) -> Dict[str, Dict[str, int]]:
+    """
+    Deletes raw artifacts older than max_age_days, then the oldest remaining raw
+    artifacts until all workspaces fit in max_size_mb. Reports, notes and scope
+    files are never deleted. A limit of 0 disables that policy.
+
+    :return: {workspace: {"files": n, "freed": bytes}}.
+    """
+    patterns = CONFIG["retention"]["raw_patterns"]
+    stats = defaultdict(lambda: {"files": 0, "freed": 0})
+    total_size = 0
+    raw_files = []
+    for workspace, entry in iter_workspace_files(workspace_root):
+        stat = entry.stat()
+        total_size += stat.st_size
+        if _is_raw(entry.name, patterns):
+            raw_files.append((stat.st_mtime, stat.st_size, workspace, Path(entry.path)))
+    raw_files.sort()
+
+    doomed = []
+    age_cutoff = time.time() - max_age_days * 86400 if max_age_days else None
+    size_cap = max_size_mb * 1024 * 1024 if max_size_mb else None
+    for mtime, size, workspace, path in raw_files:
+        if (age_cutoff is not None and mtime < age_cutoff) or (size_cap is not None and total_size > size_cap):
+            doomed.append((workspace, path, size))
+            total_size -= size
+
+    for workspace, path, size in doomed:
+        if not dry_run:
+            try:
+                path.unlink()
+            except OSError as e:
+                error(str(e), f"Error deleting {path}:")
+                continue
+        stats[workspace]["files"] += 1
+        stats[workspace]["freed"] += size
+    return stats
+
+def schedule_background_compaction():
+    """Starts a detached 'workspace compress' run, at most once per COMPACTION_INTERVAL."""
+    if not CONFIG["retention"]["auto_compress"]:
+        return
+    try:
+        if time.time() - HACKMATE_COMPACTION_STAMP.stat().st_mtime < COMPACTION_INTERVAL:
+            return
+    except OSError:
+        pass
+    try:
+        HACKMATE_COMPACTION_STAMP.touch()
+        subprocess.Popen(
+            [sys.executable, "-m", "hackmate", "workspace", "compress"],
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            start_new_session=True,
+        )
+    except OSError:
+        pass
+
+@click.group()
+def workspace():
+    """Manage workspace storage."""
+    pass
+
+@workspace.command()
+@click.option("--dry-run", is_flag=True, help="Only report which artifacts would be compressed.")
+def compress(dry_run):
+    """Compresses cold raw artifacts in all workspaces."""
+    stats = compress_cold_artifacts(Path(CONFIG["workspace_dir"]), dry_run=dry_run)
+    files = sum(s["files"] for s in stats.values())
+    saved = sum(s["before"] - s["after"] for s in stats.values())
+    emit("result", kind="compress", data={"files": files, "bytes_saved": saved, "dry_run": dry_run})
+    if dry_run:
+        console.print(f"[bold yellow]Dry run:[/bold yellow] {files} artifacts would be compressed.")
+    else:
+        console.print(f"[bold green]Compressed {files} artifacts[/bold green], saving {_human_size(saved)}.")
+
+@workspace.command()
+@click.option("--max-age", "max_age_days", type=float, default=None, help="Delete raw artifacts older than this many days (default: retention.max_age_days).")
+@click.option("--max-size", "max_size_mb", type=float, default=None, help="Delete the oldest raw artifacts until workspaces fit in this many MB (default: retention.max_size_mb).")
+@click.option("--no-compress", is_flag=True, help="Skip compressing cold artifacts.")
+@click.option("--dry-run", is_flag=True, help="Report what would be reclaimed without changing anything.")
+def gc(max_age_days, max_size_mb, no_compress, dry_run):
+    """Compresses cold artifacts and applies retention policies."""
+    workspace_root = Path(CONFIG["workspace_dir"])
+    retention = CONFIG["retention"]
+    if max_age_days is None:
+        max_age_days = retention["max_age_days"]
+    if max_size_mb is None:
+        max_size_mb = retention["max_size_mb"]
+
+    compressed = {} if no_compress else compress_cold_artifacts(workspace_root, dry_run=dry_run)
+    deleted = apply_retention(workspace_root, max_age_days, max_size_mb, dry_run=dry_run)
+
+    table = Table(title="Workspace GC" + (" (dry run)" if dry_run else ""))
+    table.add_column("Workspace", style="cyan")
+    table.add_column("Compressed", justify="right")
+    table.add_column("Deleted", justify="right")
+    table.add_column("Reclaimed", style="green", justify="right")
+
+    total = 0
+    for name in sorted(set(compressed) | set(deleted)):
+        c = compressed.get(name, {"files": 0, "before": 0, "after": 0})
+        d = deleted.get(name, {"files": 0, "freed": 0})
+        reclaimed = c["before"] - c["after"] + d["freed"]
+        total += reclaimed
+        emit("result", kind="gc", data={"workspace": name, "compressed": c["files"], "deleted": d["files"], "bytes_reclaimed": reclaimed, "dry_run": dry_run})
+        table.add_row(name, str(c["files"]), str(d["files"]), _human_size(reclaimed))
+
+    if not table.row_count:
+        console.print("[bold green]Nothing to reclaim.[/bold green]")
+        return
+    console.print(table)
+    console.print(f"[bold green]Total reclaimed:[/bold green] {_human_size(total)}" + (" [dim](compression savings unknown in a dry run)[/dim]" if dry_run and compressed else ""))
+
+if __name__ == '__main__':
+    workspace()
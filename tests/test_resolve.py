@@ -0,0 +1,120 @@
+import socket
+import struct
+import tempfile
+import threading
+import unittest
+from pathlib import Path
+
+from hackmate.resolve import (
+    QTYPE_A,
+    QTYPE_AAAA,
+    RCODE_NXDOMAIN,
+    build_query,
+    parse_response,
+    resolve_with_cache,
+)
+
+class StubDNSServer:
+    """A local UDP DNS server answering A/AAAA queries from a fixed zone."""
+
+    def __init__(self, zone):
+        # zone: {name: {"A": [ips], "AAAA": [ips]}}; names not in the zone get NXDOMAIN
+        self.zone = zone
+        self.queries = []
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.bind(("127.0.0.1", 0))
+        self.address = f"127.0.0.1:{self.sock.getsockname()[1]}"
+        self.thread = threading.Thread(target=self._serve, daemon=True)
+        self.thread.start()
+
+    def _serve(self):
+        while True:
+            try:
+                data, addr = self.sock.recvfrom(512)
+            except OSError:
+                return
+            self.sock.sendto(self.answer(data), addr)
+
+    def answer(self, query: bytes) -> bytes:
+        query_id = struct.unpack_from("!H", query)[0]
+        offset, labels = 12, []
+        while query[offset]:
+            length = query[offset]
+            labels.append(query[offset + 1:offset + 1 + length].decode())
+            offset += length + 1
+        question = query[12:offset + 5]
+        qtype = struct.unpack_from("!H", query, offset + 1)[0]
+        name = ".".join(labels)
+        self.queries.append((name, qtype))
+
+        if name not in self.zone:
+            return struct.pack("!HHHHHH", query_id, 0x8180 | RCODE_NXDOMAIN, 1, 0, 0, 0) + question
+        family, key = (socket.AF_INET, "A") if qtype == QTYPE_A else (socket.AF_INET6, "AAAA")
+        records = b""
+        addresses = self.zone[name].get(key, [])
+        for ip in addresses:
+            rdata = socket.inet_pton(family, ip)
+            records += b"\xc0\x0c" + struct.pack("!HHIH", qtype, 1, 300, len(rdata)) + rdata
+        return struct.pack("!HHHHHH", query_id, 0x8180, 1, len(addresses), 0, 0) + question + records
+
+    def close(self):
+        self.sock.close()
+
+class WireFormatTest(unittest.TestCase):
+    def test_build_query_encodes_name_and_type(self):
+        query = build_query(0x1234, "www.example.com", QTYPE_AAAA)
+        self.assertEqual(struct.unpack_from("!HHH", query), (0x1234, 0x0100, 1))
+        self.assertIn(b"\x03www\x07example\x03com\x00", query)
+        self.assertEqual(struct.unpack("!HH", query[-4:]), (QTYPE_AAAA, 1))
+
+    def test_build_query_rejects_empty_labels(self):
+        with self.assertRaises(ValueError):
+            build_query(1, "bad..example.com")
+
+    def test_parse_response_reads_a_and_aaaa_records(self):
+        server = StubDNSServer({"dual.test": {"A": ["10.0.0.1"], "AAAA": ["2001:db8::1"]}})
+        self.addCleanup(server.close)
+        self.assertEqual(parse_response(server.answer(build_query(7, "dual.test", QTYPE_A))), (7, 0, ["10.0.0.1"], 300))
+        self.assertEqual(parse_response(server.answer(build_query(8, "dual.test", QTYPE_AAAA))), (8, 0, ["2001:db8::1"], 300))
+        self.assertEqual(parse_response(server.answer(build_query(9, "missing.test"))), (9, RCODE_NXDOMAIN, [], None))
+
+class ResolveWithCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.cache_file = Path(tempfile.mkdtemp()) / "dns_cache.json"
+        self.server = StubDNSServer({
+            "dual.test": {"A": ["10.0.0.1"], "AAAA": ["2001:db8::1"]},
+            "v4.test": {"A": ["10.0.0.2"]},
+            "v6.test": {"AAAA": ["2001:db8::2"]},
+        })
+        self.addCleanup(self.server.close)
+
+    def resolve(self, hosts, server=None, record_types=None):
+        return resolve_with_cache(hosts, [(server or self.server).address], self.cache_file, record_types)
+
+    def test_merges_record_types(self):
+        result = self.resolve(["dual.test", "v4.test", "v6.test", "missing.test"], record_types=["A", "AAAA"])
+        self.assertEqual(result, {
+            "dual.test": ["10.0.0.1", "2001:db8::1"],
+            "missing.test": [],
+            "v4.test": ["10.0.0.2"],
+            "v6.test": ["2001:db8::2"],
+        })
+
+    def test_answers_repeat_lookups_from_cache(self):
+        first = self.resolve(["dual.test", "missing.test"], record_types=["A"])
+        queries = len(self.server.queries)
+        self.assertEqual(self.resolve(["dual.test", "missing.test"], record_types=["A"]), first)
+        self.assertEqual(len(self.server.queries), queries)
+
+    def test_cache_is_kept_per_resolver(self):
+        other = StubDNSServer({"dual.test": {"A": ["192.0.2.9"]}})
+        self.addCleanup(other.close)
+        self.assertEqual(self.resolve(["dual.test"], record_types=["A"]), {"dual.test": ["10.0.0.1"]})
+        self.assertEqual(self.resolve(["dual.test"], server=other, record_types=["A"]), {"dual.test": ["192.0.2.9"]})
+
+    def test_rejects_unknown_record_types(self):
+        with self.assertRaises(ValueError):
+            self.resolve(["dual.test"], record_types=["MX"])
+
+if __name__ == "__main__":
+    unittest.main()